@@ -0,0 +1,377 @@
+"""Benchmark offline do bot_pdf contra um site de curso falso servido localmente.
+
+Uso: python benchmark.py [--aulas 20] [--tamanho-kb 512] [--latencia-ms 20] [--falhas 0.0] [--escrita-mb 300]
+Cada execução é acrescentada a benchmark_resultados.jsonl e comparada com a anterior de mesmos parâmetros.
+Com --verificar-extracao, só confere a extração de links contra corpus_links.json.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bot_pdf
+
+ARQUIVO_RESULTADOS = "benchmark_resultados.jsonl"
+ARQUIVO_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_links.json")
+LIMIAR_REGRESSAO = 0.20
+RE_PDF = re.compile(r"^/pdf/(\d+)\.pdf$")
+RE_AULA = re.compile(r"^/app/cursos/1/aulas/(\d+)$")
+BLOCOS_ESCRITA = (8 * 1024, 256 * 1024, 1024 * 1024)
+
+
+def _gerar_pdf(tamanho: int, indice: int) -> bytes:
+    """PDF mínimo mas bem formado (uma imagem de bytes aleatórios, xref e trailer), para passar na verificação."""
+    cabecalho = f"%PDF-1.4\n% aula {indice}\n".encode()
+    rodape_fixo = 180
+    miolo = random.Random(indice).randbytes(max(0, tamanho - len(cabecalho) - rodape_fixo))
+    objeto = b"1 0 obj\n<< /Type /XObject /Subtype /Image /Length %d >>\nstream\n" % len(miolo) + miolo + b"\nendstream\nendobj\n"
+    xref = len(cabecalho) + len(objeto)
+    rodape = b"xref\n0 2\n0000000000 65535 f \n%010d 00000 n \ntrailer\n<< /Size 2 >>\nstartxref\n%d\n%%%%EOF\n" % (len(cabecalho), xref)
+    return cabecalho + objeto + rodape
+
+
+def _pagina_grande(links: int) -> str:
+    """Página sintética parecida com um catálogo real: muito texto, menus e poucos PDFs."""
+    rng = random.Random(links)
+    partes = ["<html><head><title>Catalogo</title><script>var x = '<a href=\"/falso.pdf\">';</script></head><body>"]
+    for i in range(links):
+        tipo = rng.random()
+        if tipo < 0.05:
+            partes.append(f'<div class="card"><a href="/livros/{i}/download">Baixar Livro {i}</a></div>')
+        elif tipo < 0.15:
+            partes.append(f'<p>Apostila <a href="/arquivos/material_{i}.pdf">PDF {i}</a></p>')
+        elif tipo < 0.2:
+            partes.append(f'<button data-href="/material/{i}">Material</button>')
+        else:
+            partes.append(f'<li><a href="/paginas/{i}?ref=menu">Item {i} com descricao</a> <span>{"texto " * 8}</span></li>')
+    partes.append("</body></html>")
+    return "".join(partes)
+
+
+class SiteFalso:
+    """Servidor HTTP local que imita uma plataforma de cursos."""
+
+    def __init__(self, aulas: int = 20, tamanho_pdf: int = 512 * 1024, latencia: float = 0.0, taxa_falha: float = 0.0, tamanho_grande: int = 0):
+        self.aulas = aulas
+        self.tamanho_grande = tamanho_grande
+        self.bloco_grande = _gerar_pdf(1024 * 1024, 0)
+        self.latencia = latencia
+        self.taxa_falha = taxa_falha
+        self.pdfs = {i: _gerar_pdf(tamanho_pdf, i) for i in range(1, aulas + 1)}
+        self.etags = {i: '"%s"' % hashlib.md5(pdf).hexdigest() for i, pdf in self.pdfs.items()}
+        self.grande = _pagina_grande(5000).encode()
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._manipulador())
+        self.servidor.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    def _falhar(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.taxa_falha
+
+    def _manipulador(self):
+        site = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status: int, corpo: bytes, tipo: str = "text/html; charset=utf-8", extras: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                for nome, valor in (extras or {}).items():
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                if site.latencia:
+                    time.sleep(site.latencia)
+                caminho = self.path.split("?")[0]
+                if caminho == "/app/cursos/1/aulas":
+                    itens = "".join(f'<li><a href="/app/cursos/1/aulas/{i}">Aula {i}</a></li>' for i in range(1, site.aulas + 1))
+                    return self._responder(200, f"<html><body><ul>{itens}</ul></body></html>".encode())
+                if caminho == "/catalogo":
+                    itens = "".join(f'<p><a href="/pdf/{i}.pdf">Aula {i}</a></p>' for i in site.pdfs)
+                    return self._responder(200, f"<html><body>{itens}</body></html>".encode())
+                if caminho == "/grande":
+                    return self._responder(200, site.grande)
+                if caminho == "/grande.pdf" and site.tamanho_grande:
+                    return self._enviar_grande()
+                match = RE_AULA.match(caminho)
+                if match and int(match.group(1)) in site.pdfs:
+                    corpo = f'<html><body><h1>Aula {match.group(1)}</h1><a href="/pdf/{match.group(1)}.pdf">Baixar Livro Eletrônico (versão original)</a></body></html>'
+                    return self._responder(200, corpo.encode())
+                match = RE_PDF.match(caminho)
+                if match and int(match.group(1)) in site.pdfs:
+                    if site._falhar():
+                        return self._responder(503, b"indisponivel", extras={"Retry-After": "0"})
+                    return self._enviar_pdf(int(match.group(1)))
+                return self._responder(404, b"nao encontrado")
+
+            def _enviar_pdf(self, indice: int):
+                pdf, etag = site.pdfs[indice], site.etags[indice]
+                if self.headers.get("If-None-Match") == etag:
+                    return self._responder(304, b"", extras={"ETag": etag})
+                faixa = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if faixa and self.headers.get("If-Range", etag) == etag:
+                    inicio = int(faixa.group(1))
+                    fim = min(int(faixa.group(2)) if faixa.group(2) else len(pdf) - 1, len(pdf) - 1)
+                    if inicio >= len(pdf):
+                        return self._responder(416, b"", extras={"Content-Range": f"bytes */{len(pdf)}"})
+                    return self._responder(206, pdf[inicio:fim + 1], "application/pdf", {
+                        "ETag": etag, "Accept-Ranges": "bytes", "Content-Range": f"bytes {inicio}-{fim}/{len(pdf)}",
+                    })
+                return self._responder(200, pdf, "application/pdf", {"ETag": etag, "Accept-Ranges": "bytes"})
+
+            def _enviar_grande(self):
+                # Gerado em blocos para não manter centenas de MB na memória do servidor.
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(site.tamanho_grande))
+                self.end_headers()
+                restante = site.tamanho_grande
+                while restante > 0:
+                    pedaco = site.bloco_grande[:restante]
+                    self.wfile.write(pedaco)
+                    restante -= len(pedaco)
+
+        return Manipulador
+
+    def __enter__(self) -> "SiteFalso":
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def _cronometrar(funcao, repeticoes: int) -> list[float]:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def _silencioso(funcao):
+    def envolvida(*args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return funcao(*args, **kwargs)
+    return envolvida
+
+
+def _resultado(tempos: list[float], **extras) -> dict:
+    return {"mediana_s": round(statistics.median(tempos), 6), "min_s": round(min(tempos), 6), "repeticoes": len(tempos), **extras}
+
+
+def executar(site: SiteFalso, repeticoes: int) -> dict:
+    bot_pdf.METRICAS.progresso = False
+    # A verificação faz parte do pipeline, mas o índice do benchmark não deve se misturar ao do usuário.
+    indice = tempfile.TemporaryDirectory()
+    bot_pdf.VERIFICADOR.configurar(caminho_indice=os.path.join(indice.name, "indice.sqlite3"))
+    sessao = bot_pdf._preparar_sessao(None, bot_pdf.MAX_DOWNLOADS_SIMULTANEOS * 2)
+    total_bytes = sum(len(pdf) for pdf in site.pdfs.values())
+    resultados = {}
+
+    html = site.grande.decode()
+    tempos = _cronometrar(lambda: bot_pdf._extrair_pdfs_html(html, site.base + "/grande"), repeticoes)
+    resultados["extrair_pdfs_html"] = _resultado(tempos, mb_por_s=round(len(site.grande) / 2**20 / statistics.median(tempos), 2))
+
+    encontrar = _silencioso(bot_pdf.encontrar_pdfs)
+    tempos = _cronometrar(lambda: encontrar(site.base + "/grande", sessao), repeticoes)
+    resultados["encontrar_pdfs"] = _resultado(tempos)
+
+    baixar = _silencioso(bot_pdf.baixar_pdf)
+
+    def _baixar_todos():
+        with tempfile.TemporaryDirectory() as pasta:
+            for i in site.pdfs:
+                baixar(f"{site.base}/pdf/{i}.pdf", pasta, sessao)
+
+    tempos = _cronometrar(_baixar_todos, repeticoes)
+    resultados["baixar_pdf"] = _resultado(tempos, mb_por_s=round(total_bytes / 2**20 / statistics.median(tempos), 2))
+
+    site_completo = _silencioso(bot_pdf.baixar_pdfs_site)
+
+    def _pipeline_site():
+        with tempfile.TemporaryDirectory() as pasta:
+            site_completo(site.base + "/catalogo", pasta, sessao)
+
+    tempos = _cronometrar(_pipeline_site, repeticoes)
+    resultados["baixar_pdfs_site"] = _resultado(tempos, mb_por_s=round(total_bytes / 2**20 / statistics.median(tempos), 2))
+
+    # O modo curso só aceita URLs https de aula; aqui medimos a leitura das aulas por HTTP.
+    def _ler_aulas():
+        links = [bot_pdf._extrair_pdfs_aula_http(sessao, f"{site.base}/app/cursos/1/aulas/{i}") for i in site.pdfs]
+        assert all(links), "aula sem link de versao original"
+
+    tempos = _cronometrar(_ler_aulas, repeticoes)
+    resultados["ler_aulas_http"] = _resultado(tempos)
+
+    # Processo novo, como na linha de comando: inclui importações e a montagem da sessão.
+    primeiras = []
+    for _ in range(repeticoes):
+        with tempfile.TemporaryDirectory() as pasta:
+            relatorio = os.path.join(pasta, "metricas.jsonl")
+            subprocess.run(
+                [sys.executable, os.path.abspath(bot_pdf.__file__), site.base + "/catalogo", "--pasta", pasta, "--metricas", relatorio, "--sem-verificacao"],
+                capture_output=True, check=True,
+            )
+            with open(relatorio, encoding="utf-8") as f:
+                etapas = {linha["etapa"]: linha for linha in map(json.loads, f)}
+            primeiras.append(etapas["primeira_requisicao"]["soma_s"])
+    resultados["primeira_requisicao_cli"] = _resultado(primeiras)
+    bot_pdf.VERIFICADOR.fechar()
+    indice.cleanup()
+    return resultados
+
+
+def executar_escrita(site: SiteFalso, repeticoes: int) -> dict:
+    """Baixa um arquivo grande com blocos de tamanhos diferentes e conta as chamadas de escrita."""
+    sessao = bot_pdf._preparar_sessao(None, 2)
+    baixar = _silencioso(bot_pdf.baixar_pdf)
+    escrever_original = bot_pdf._GravadorParcial.escrever
+    resultados = {}
+    for bloco in BLOCOS_ESCRITA:
+        escritas = [0]
+
+        def _contando(self, dados, _contador=escritas):
+            _contador[0] += 1
+            escrever_original(self, dados)
+
+        def _baixar_grande():
+            with tempfile.TemporaryDirectory() as pasta:
+                assert baixar(site.base + "/grande.pdf", pasta, sessao, tamanho_bloco=bloco)
+
+        bot_pdf._GravadorParcial.escrever = _contando
+        try:
+            tempos = _cronometrar(_baixar_grande, repeticoes)
+        finally:
+            bot_pdf._GravadorParcial.escrever = escrever_original
+        resultados[f"escrita_{bloco // 1024}kb"] = _resultado(
+            tempos, mb_por_s=round(site.tamanho_grande / 2**20 / statistics.median(tempos), 2), escritas=escritas[0] // len(tempos),
+        )
+    return resultados
+
+
+def verificar_extracao(caminho: str = ARQUIVO_CORPUS) -> int:
+    """Confere a extração de links com cada parser contra o corpus; devolve o número de divergências.
+
+    Os resultados esperados do corpus vieram da extração original (BeautifulSoup + html.parser),
+    então qualquer mudança nas regras ou nos coletores que altere a saída aparece aqui.
+    """
+    with open(caminho, encoding="utf-8") as f:
+        corpus = json.load(f)
+    base_url = corpus["base_url"]
+    regras = bot_pdf.regras_para(base_url)
+    coletores = {"bs4": bot_pdf._coletar_candidatos_bs4}
+    if bot_pdf._coletar_candidatos_lxml("<a></a>") is not None:
+        coletores["lxml"] = bot_pdf._coletar_candidatos_lxml
+
+    divergencias = 0
+    for n, caso in enumerate(corpus["casos"], start=1):
+        esperado = set(caso["esperado"])
+        for nome, coletar in coletores.items():
+            candidatos = coletar(caso["html"], regras=regras) or bot_pdf._novos_candidatos()
+            obtido = set(bot_pdf._escolher_pdfs(candidatos, base_url, caso["apenas_versao_original"], regras))
+            if obtido != esperado:
+                divergencias += 1
+                print(f"[Divergencia] caso {n} ({nome}): faltando {sorted(esperado - obtido)}, sobrando {sorted(obtido - esperado)}")
+    print(f"{len(corpus['casos'])} caso(s) do corpus conferido(s) com {', '.join(coletores)}: {divergencias} divergencia(s)")
+    return divergencias
+
+
+def _commit_atual() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _anterior(caminho: str, parametros: dict) -> dict | None:
+    ultimo = None
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue
+                if registro.get("parametros") == parametros:
+                    ultimo = registro
+    except OSError:
+        return None
+    return ultimo
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline do bot_pdf")
+    parser.add_argument("--aulas", type=int, default=20)
+    parser.add_argument("--tamanho-kb", type=int, default=512)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--falhas", type=float, default=0.0, help="fração de respostas 503 nos PDFs (0 a 1)")
+    parser.add_argument("--escrita-mb", type=int, default=0, help="também mede a escrita de um arquivo desse tamanho com blocos de 8 KB, 256 KB e 1 MB")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default=ARQUIVO_RESULTADOS)
+    parser.add_argument("--verificar-extracao", action="store_true", help=f"só confere a extração de links contra {os.path.basename(ARQUIVO_CORPUS)}")
+    args = parser.parse_args()
+    if args.verificar_extracao:
+        return 1 if verificar_extracao() else 0
+
+    parametros = {"aulas": args.aulas, "tamanho_kb": args.tamanho_kb, "latencia_ms": args.latencia_ms, "falhas": args.falhas, "repeticoes": args.repeticoes, "escrita_mb": args.escrita_mb}
+    with SiteFalso(args.aulas, args.tamanho_kb * 1024, args.latencia_ms / 1000, args.falhas, args.escrita_mb * 2**20) as site:
+        resultados = executar(site, max(1, args.repeticoes))
+        if args.escrita_mb:
+            resultados.update(executar_escrita(site, max(1, args.repeticoes)))
+
+    anterior = _anterior(args.saida, parametros)
+    regressoes = []
+    print(f"{'etapa':<24} {'mediana':>10} {'MB/s':>8} {'escritas':>9} {'anterior':>10} {'variacao':>9}")
+    for etapa, r in resultados.items():
+        antes = (anterior or {}).get("resultados", {}).get(etapa, {}).get("mediana_s")
+        variacao = (r["mediana_s"] / antes - 1) if antes else None
+        if variacao is not None and variacao > LIMIAR_REGRESSAO:
+            regressoes.append(etapa)
+        print(f"{etapa:<24} {r['mediana_s']:>9.4f}s {r.get('mb_por_s', ''):>8} {r.get('escritas', ''):>9} "
+              f"{(f'{antes:.4f}s' if antes else '-'):>10} {(f'{variacao:+.0%}' if variacao is not None else '-'):>9}")
+
+    with open(args.saida, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _commit_atual(),
+            "python": sys.version.split()[0],
+            "lxml": bot_pdf._coletar_candidatos_lxml("<a></a>") is not None,
+            "parametros": parametros,
+            "resultados": resultados,
+        }, ensure_ascii=False) + "\n")
+    print(f"\nResultados acrescentados a {args.saida}")
+    if regressoes:
+        print(f"[Regressao] Mais de {LIMIAR_REGRESSAO:.0%} mais lento que a execucao anterior: {', '.join(regressoes)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,77 @@
 """Bot para baixar PDFs de websites. Usa cookies para sites com login."""
 
+from __future__ import annotations
+
+import codecs
+import csv
+import functools
+import hashlib
+import heapq
+import importlib.util
+import json
+import mmap
 import os
+import queue
+import random
 import re
+import shutil
 import sys
+import threading
+import time
+import weakref
+import zlib
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
 from http.cookiejar import MozillaCookieJar
-from urllib.parse import urljoin, urlparse
+from typing import Callable, Iterator
+from urllib.parse import unquote, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+# Marcado antes das dependências pesadas para que o tempo até a primeira requisição inclua a importação delas.
+_INICIO_PROCESSO = time.monotonic()
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
 ARQUIVO_COOKIES = "cookies.txt"
+PASTA_PERFIL_NAVEGADOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".perfil_navegador")
+ARQUIVO_MANIFESTO = ".manifesto.jsonl"
+ARQUIVO_INDICE_BLOBS = "indice.jsonl"
+ARQUIVO_CACHE_PAGINAS = ".cache_paginas.json"
+ARQUIVO_FILA = ".fila.sqlite3"
+ARQUIVO_REGRAS = "regras_links.json"
+ARQUIVO_INDICE_PDFS = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".indice_pdfs.sqlite3")
+MAX_CACHE_PAGINAS = 5000
+VALIDADE_CACHE_NAVEGADOR = 24 * 3600
+INTERVALO_BATIMENTO_FILA = 10.0
+PRAZO_BATIMENTO_FILA = 60.0
+MAX_DOWNLOADS_SIMULTANEOS = 4
+MAX_DOWNLOADS_POR_HOST = 2
+BACKOFF_BASE = 2.0
+BACKOFF_MAXIMO = 60.0
+TEMPO_MAXIMO_ESPERA = 20.0
+ESTABILIDADE_DOM_MS = 1000
+NAVEGADORES_SIMULTANEOS = 3
+INTERVALO_HOST_LOTE = 0.5
+RAJADA_HOST = 4
+TAXA_APOS_LIMITE = 4.0
+TAXA_MINIMA_HOST = 0.1
+TENTATIVAS_LIMITE = 3
+RETRY_AFTER_MAXIMO = 300.0
+HOSTS_POR_SESSAO = 16
+PROFUNDIDADE_RASTREIO = 2
+MAX_PAGINAS_RASTREIO = 200
+BYTES_SONDAGEM = 1024
+TAMANHO_BLOCO_DOWNLOAD = 256 * 1024
+INTERVALO_PROGRESSO = 5.0
+LIMITE_TEXTO_IMPRESSAO = 64 * 1024
+LIMITE_STREAM_PDF = 8 * 1024 * 1024
+LIMITES_HISTOGRAMA = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RE_PAGINACAO_TEXTO = re.compile(r"^(?:\d+|pr[óo]xim[ao]|seguinte|next|mais|»|›|>+)$|p[áa]gina|page", re.IGNORECASE)
+RE_PAGINACAO_URL = re.compile(r"[?&](?:page|pagina|pag|p)=\d+|/page/\d+|/pagina/\d+", re.IGNORECASE)
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0.0.0 Safari/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -17,9 +79,126 @@ HEADERS = {
 }
 
 
-def carregar_sessao(cookies_path: str | None = None) -> requests.Session:
-    sessao = requests.Session()
-    sessao.headers.update(HEADERS)
+def _formatar_bytes(quantidade: float) -> str:
+    if quantidade < 1024:
+        return f"{quantidade:.0f} B"
+    for unidade in ("KB", "MB"):
+        quantidade /= 1024
+        if quantidade < 1024:
+            return f"{quantidade:.1f} {unidade}"
+    return f"{quantidade / 1024:.1f} GB"
+
+
+class Metricas:
+    """Tempo gasto em cada etapa e bytes baixados, somados entre todas as threads.
+
+    Com o terminal interativo, mostra a taxa de download a cada INTERVALO_PROGRESSO segundos.
+    """
+
+    def __init__(self, progresso: bool | None = None, inicio: float | None = None):
+        self.progresso = sys.stdout.isatty() if progresso is None else progresso
+        self.inicio = time.monotonic() if inicio is None else inicio
+        self.bytes = 0
+        self._duracoes: dict[str, list[float]] = {}
+        self._ultimo_progresso = (self.inicio, 0)
+        self._primeira_requisicao = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def medir(self, etapa: str):
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.monotonic() - inicio)
+
+    def registrar(self, etapa: str, segundos: float) -> None:
+        with self._lock:
+            self._duracoes.setdefault(etapa, []).append(segundos)
+
+    def marcar_primeira_requisicao(self) -> None:
+        """Guarda, uma única vez, quanto tempo o processo levou até a primeira requisição sair."""
+        with self._lock:
+            if self._primeira_requisicao:
+                return
+            self._primeira_requisicao = True
+            self._duracoes.setdefault("primeira_requisicao", []).append(time.monotonic() - self.inicio)
+
+    def somar_bytes(self, quantidade: int) -> None:
+        with self._lock:
+            self.bytes += quantidade
+            agora = time.monotonic()
+            desde, bytes_antes = self._ultimo_progresso
+            if not self.progresso or agora - desde < INTERVALO_PROGRESSO:
+                return
+            self._ultimo_progresso = (agora, self.bytes)
+            taxa = (self.bytes - bytes_antes) / (agora - desde)
+            print(f"  [Progresso] {_formatar_bytes(self.bytes)} baixados, {_formatar_bytes(taxa)}/s")
+
+    def resumo(self) -> list[dict]:
+        with self._lock:
+            duracoes = {etapa: sorted(valores) for etapa, valores in self._duracoes.items()}
+            total_bytes = self.bytes
+        linhas = []
+        for etapa, valores in sorted(duracoes.items()):
+            histograma = {str(limite): sum(1 for v in valores if v <= limite) for limite in LIMITES_HISTOGRAMA}
+            histograma["+Inf"] = len(valores)
+            linhas.append({
+                "etapa": etapa,
+                "contagem": len(valores),
+                "soma_s": round(sum(valores), 6),
+                "p50_s": round(valores[len(valores) // 2], 6),
+                "p95_s": round(valores[min(len(valores) - 1, int(len(valores) * 0.95))], 6),
+                "max_s": round(valores[-1], 6),
+                "histograma": histograma,
+            })
+        segundos = time.monotonic() - self.inicio
+        linhas.append({
+            "etapa": "total",
+            "segundos": round(segundos, 3),
+            "bytes": total_bytes,
+            "bytes_por_segundo": round(total_bytes / segundos, 1) if segundos > 0 else 0.0,
+        })
+        return linhas
+
+    def gravar(self, caminho: str) -> None:
+        """Salva o resumo em JSON lines ou, se o arquivo terminar em .prom, no formato texto do Prometheus."""
+        linhas = self.resumo()
+        with open(caminho, "w", encoding="utf-8") as f:
+            if not caminho.endswith(".prom"):
+                for linha in linhas:
+                    f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+                return
+            total = linhas.pop()
+            f.write("# TYPE bot_pdf_etapa_segundos histogram\n")
+            for linha in linhas:
+                for limite, contagem in linha["histograma"].items():
+                    f.write(f'bot_pdf_etapa_segundos_bucket{{etapa="{linha["etapa"]}",le="{limite}"}} {contagem}\n')
+                f.write(f'bot_pdf_etapa_segundos_sum{{etapa="{linha["etapa"]}"}} {linha["soma_s"]}\n')
+                f.write(f'bot_pdf_etapa_segundos_count{{etapa="{linha["etapa"]}"}} {linha["contagem"]}\n')
+            f.write("# TYPE bot_pdf_bytes_total counter\n")
+            f.write(f"bot_pdf_bytes_total {total['bytes']}\n")
+            f.write("# TYPE bot_pdf_duracao_segundos gauge\n")
+            f.write(f"bot_pdf_duracao_segundos {total['segundos']}\n")
+            f.write("# TYPE bot_pdf_bytes_por_segundo gauge\n")
+            f.write(f"bot_pdf_bytes_por_segundo {total['bytes_por_segundo']}\n")
+
+
+METRICAS = Metricas(inicio=_INICIO_PROCESSO)
+
+
+def _medido(etapa: str):
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with METRICAS.medir(etapa):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def carregar_sessao(cookies_path: str | None = None, tamanho_pool: int = MAX_DOWNLOADS_SIMULTANEOS * 2) -> requests.Session:
+    sessao = _preparar_sessao(None, tamanho_pool)
     caminho = cookies_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_COOKIES)
     if os.path.exists(caminho):
         try:
@@ -33,10 +212,10 @@ def carregar_sessao(cookies_path: str | None = None) -> requests.Session:
 
 
 def encontrar_pdfs(url: str, sessao: requests.Session | None = None) -> list[str]:
-    sessao = sessao or requests.Session()
-    sessao.headers.update(HEADERS)
+    sessao = sessao or sessao_compartilhada()
     try:
-        response = sessao.get(url, timeout=15)
+        with METRICAS.medir("buscar_pagina"):
+            response = sessao.get(url, timeout=15)
         response.raise_for_status()
     except requests.RequestException as e:
         print(f"Erro ao acessar {url}: {e}")
@@ -45,54 +224,356 @@ def encontrar_pdfs(url: str, sessao: requests.Session | None = None) -> list[str
     return _extrair_pdfs_html(response.text, url)
 
 
-def _extrair_pdfs_html(html: str, base_url: str, apenas_versao_original: bool = False) -> list[str]:
+# Cada regra é uma lista de expressões regulares, sem diferença entre maiúsculas e minúsculas.
+# Um arquivo regras_links.json ao lado do bot (ou --regras ARQ) pode mudar qualquer uma delas,
+# para todos os sites ("padrao") ou só para um ("sites": {"dominio.com": {...}}).
+REGRAS_PADRAO = {
+    # Texto do botão do livro: precisa ter ao menos um item de cada grupo.
+    "texto_livro": [["baixar"], ["livro", "eletr[ôo]nico"]],
+    "versao_original": ["vers[ãa]o original"],
+    "href_pdf": [r"\.pdf"],
+    "href_amplo": ["/download", "/material", "livro", "ebook", "pdf"],
+    # Nomes (literais) procurados na classe da tag, e palavras que o valor do atributo precisa ter.
+    "atributos_data": ["data-href", "data-url", "data-download"],
+    "valor_data": ["pdf", "download", "livro"],
+    "url_aula": [r"https://[^/]+/[^/]+/cursos/\d+/aulas/\d+", r"https://[^/]+/app/dashboard/cursos/\d+/aulas/\d+"],
+    "caminho_aula": [r"(?:https?://[^/\s\"'<>]+)?(?:/[^/\s\"'<>]+)+/cursos/\d+/aulas/\d+"],
+}
+_TAGS_SEM_TEXTO = ("script", "style", "template")
+_TAGS_EMBUTIDAS = ("embed", "object", "iframe")
+
+
+def _alternativas(padroes: list[str]) -> re.Pattern:
+    return re.compile("|".join(f"(?:{p})" for p in padroes) or r"(?!)", re.IGNORECASE)
+
+
+def _novos_candidatos(com_links: bool = False) -> dict[str, list]:
+    candidatos = {"livro": [], "pdf": [], "data": [], "amplo": []}
+    if com_links:
+        candidatos["links"] = []
+    return candidatos
+
+
+class RegrasLinks:
+    """Heurísticas de links de um site, compiladas uma vez em poucas regexes combinadas.
+
+    Cada link é avaliado uma vez: uma regex no texto (botão de livro) e uma no href, cujos
+    grupos nomeados dizem se é PDF direto ou só um link promissor.
+    """
+
+    def __init__(self, regras: dict):
+        self.regras = regras
+        # Lookaheads: todos os grupos em qualquer ordem, numa única chamada a match().
+        self.texto_livro = re.compile("".join(f"(?=.*?(?:{'|'.join(grupo)}))" for grupo in regras["texto_livro"]), re.IGNORECASE | re.DOTALL)
+        self.versao_original = _alternativas(regras["versao_original"])
+        self.href_pdf = _alternativas(regras["href_pdf"])
+        self.href = re.compile(
+            f"(?P<pdf>{'|'.join(regras['href_pdf']) or '(?!)'})|(?P<amplo>{'|'.join(regras['href_amplo']) or '(?!)'})",
+            re.IGNORECASE,
+        )
+        self.atributos_data = tuple(regras["atributos_data"])
+        self.classe_data = _alternativas([re.escape(a) for a in self.atributos_data])
+        self.valor_data = _alternativas(regras["valor_data"])
+        self.url_aula = _alternativas(regras["url_aula"])
+        self.caminho_aula = _alternativas(regras["caminho_aula"])
+        self._xpath_data = None
+
+    def e_livro(self, texto: str) -> bool:
+        return self.texto_livro.match(texto) is not None
+
+    def classificar_link(self, href: str, texto: str, candidatos: dict[str, list]) -> None:
+        if self.e_livro(texto):
+            candidatos["livro"].append((href, texto))
+        achado = self.href.search(href)
+        if achado:
+            if achado.lastgroup == "pdf" or self.href_pdf.search(href, achado.end()):
+                candidatos["pdf"].append(href)
+            if not href.startswith("#"):
+                candidatos["amplo"].append(href)
+        if "links" in candidatos:
+            candidatos["links"].append((href, texto))
+
+    def classificar_data(self, attrs: dict, candidatos: dict[str, list]) -> None:
+        # Mantém o comportamento original: o filtro `attrs=lambda ...` do BeautifulSoup era
+        # aplicado à *classe* da tag, então só tags com "data-href"/... na classe entram aqui.
+        classe = attrs.get("class")
+        if classe and self.classe_data.search(classe):
+            for attr in self.atributos_data:
+                val = attrs.get(attr, "")
+                if val and self.valor_data.search(val):
+                    candidatos["data"].append(val)
+
+    def classificar(self, nome: str, attrs: dict, texto_ancora: Callable[[], str], candidatos: dict[str, list]) -> None:
+        if nome == "a":
+            href = attrs.get("href")
+            if href is not None:
+                self.classificar_link(href.strip(), texto_ancora(), candidatos)
+        elif nome in _TAGS_EMBUTIDAS and "src" in attrs:
+            src = attrs.get("data") or attrs.get("src", "")
+            if src and self.href_pdf.search(src):
+                candidatos["pdf"].append(src)
+        if "class" in attrs:
+            self.classificar_data(attrs, candidatos)
+
+    def elementos_data(self, raiz, html: str) -> list:
+        """Tags (fora as de link) com um dos atributos_data na classe, filtradas pelo lxml."""
+        # Quase nenhuma página tem esses nomes; uma busca no HTML bruto evita percorrer a árvore.
+        if not self.classe_data.search(html):
+            return []
+        if self._xpath_data is None:
+            from lxml import etree
+
+            nomes = [a for a in self.atributos_data if '"' not in a]
+            condicao = " or ".join(f'contains(@class, "{a}")' for a in nomes) or "false()"
+            # [@class] antes da condição: o lxml descarta logo as tags sem classe.
+            self._xpath_data = etree.XPath(f"//*[@class][{condicao}]")
+        return [e for e in self._xpath_data(raiz) if e.tag != "a" and e.tag not in _TAGS_EMBUTIDAS]
+
+    def normalizar_aula(self, href: str) -> str | None:
+        match = self.url_aula.search(href)
+        return match.group(0) if match else None
+
+
+_CAMINHO_REGRAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_REGRAS)
+
+
+@functools.lru_cache(maxsize=None)
+def _carregar_regras() -> dict:
+    if not os.path.exists(_CAMINHO_REGRAS):
+        return {}
+    try:
+        with open(_CAMINHO_REGRAS, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  [Aviso] Regras de links ignoradas ({_CAMINHO_REGRAS}): {e}")
+        return {}
+
+
+@functools.lru_cache(maxsize=256)
+def _regras_host(host: str) -> RegrasLinks:
+    config = _carregar_regras()
+    regras = {**REGRAS_PADRAO, **config.get("padrao", {})}
+    # Do domínio mais geral para o mais específico: "aulas.site.com" sobrescreve "site.com".
+    for site in sorted(config.get("sites", {}), key=len):
+        if host == site or host.endswith("." + site):
+            regras.update(config["sites"][site])
+    try:
+        return RegrasLinks(regras)
+    except (re.error, KeyError, TypeError) as e:
+        print(f"  [Aviso] Regras de links invalidas para {host or 'todos os sites'} ({e}); usando as padrao")
+        return RegrasLinks(REGRAS_PADRAO)
+
+
+def regras_para(url: str) -> RegrasLinks:
+    """Regras compiladas do site de `url` (as padrão, mais as do arquivo de regras)."""
+    return _regras_host((urlparse(url).hostname or "").lower())
+
+
+def configurar_regras(caminho: str) -> None:
+    global _CAMINHO_REGRAS
+    _CAMINHO_REGRAS = caminho
+    _carregar_regras.cache_clear()
+    _regras_host.cache_clear()
+
+
+def _textos_lxml(elemento):
+    if elemento.text:
+        yield elemento.text
+    for filho in elemento:
+        if isinstance(filho.tag, str) and filho.tag not in _TAGS_SEM_TEXTO:
+            yield from _textos_lxml(filho)
+        if filho.tail:
+            yield filho.tail
+
+
+def _texto_ancora_lxml(elemento) -> str:
+    # A maioria dos links é só texto, sem tags dentro: dispensa o gerador.
+    if not len(elemento):
+        return (elemento.text or "").strip()
+    return "".join(t.strip() for t in _textos_lxml(elemento))
+
+
+def _coletar_candidatos_lxml(html: str, com_links: bool = False, regras: RegrasLinks | None = None) -> dict[str, list] | None:
+    try:
+        import lxml.html
+    except ImportError:
+        return None
+    try:
+        raiz = lxml.html.fromstring(html)
+    except Exception:
+        # Documento vazio ou com declaração de encoding: o html.parser resolve.
+        return None
+    regras = regras or regras_para("")
+    candidatos = _novos_candidatos(com_links)
+    # Só as tags que interessam saem da árvore (o filtro roda no lxml, em C), e não todas.
+    for elemento in raiz.iter("a", *_TAGS_EMBUTIDAS):
+        regras.classificar(elemento.tag, elemento.attrib, lambda: _texto_ancora_lxml(elemento), candidatos)
+    for elemento in regras.elementos_data(raiz, html):
+        regras.classificar_data(elemento.attrib, candidatos)
+    return candidatos
+
+
+def _coletar_candidatos_bs4(html: str, com_links: bool = False, regras: RegrasLinks | None = None) -> dict[str, list]:
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
-    pdfs = []
+    regras = regras or regras_para("")
+    candidatos = _novos_candidatos(com_links)
+    for tag in soup.find_all(True):
+        attrs = tag.attrs
+        if isinstance(attrs.get("class"), list):
+            attrs = {**attrs, "class": " ".join(attrs["class"])}
+        regras.classificar(tag.name, attrs, lambda: tag.get_text(strip=True), candidatos)
+    return candidatos
 
-    def _filtro_versao(tag) -> bool:
-        if not apenas_versao_original:
-            return True
-        texto = tag.get_text(strip=True).lower()
-        return "versão original" in texto or "versao original" in texto
 
-    for tag in soup.find_all("a", href=True):
-        texto = tag.get_text(strip=True).lower()
-        if "baixar" in texto and ("livro" in texto or "eletrônico" in texto or "eletronico" in texto):
-            if _filtro_versao(tag):
-                href = tag["href"].strip()
-                if href and not href.startswith("#") and "javascript" not in href.lower():
-                    pdfs.append(urljoin(base_url, href))
+def _coletar_candidatos(html: str, com_links: bool = False, regras: RegrasLinks | None = None) -> dict[str, list]:
+    candidatos = _coletar_candidatos_lxml(html, com_links, regras)
+    return candidatos if candidatos is not None else _coletar_candidatos_bs4(html, com_links, regras)
 
-    if pdfs:
-        return list(set(pdfs))
 
-    if not apenas_versao_original:
-        for link in soup.find_all("a", href=True):
-            href = link["href"].strip()
-            if href.lower().endswith(".pdf") or ".pdf" in href.lower():
-                pdfs.append(urljoin(base_url, href))
-
-        for tag in soup.find_all(["embed", "object", "iframe"], src=True):
-            src = tag.get("data") or tag.get("src", "")
-            if src and ".pdf" in src.lower():
-                pdfs.append(urljoin(base_url, src))
-
-    if not apenas_versao_original:
-        for tag in soup.find_all(attrs=lambda x: x and any(k in str(x) for k in ["data-href", "data-url", "data-download"])):
-            for attr in ["data-href", "data-url", "data-download"]:
-                val = tag.get(attr, "")
-                if val and ("pdf" in val.lower() or "download" in val.lower() or "livro" in val.lower()):
-                    pdfs.append(urljoin(base_url, val))
-        for tag in soup.find_all("a", href=True):
-            href = tag["href"].strip()
-            if any(k in href.lower() for k in ["/download", "/material", "livro", "ebook", "pdf"]):
-                if href and not href.startswith("#"):
-                    pdfs.append(urljoin(base_url, href))
+def _filtrar_livros(itens: list[tuple[str, str]], base_url: str, apenas_versao_original: bool = False, regras: RegrasLinks | None = None) -> list[str]:
+    regras = regras or regras_para(base_url)
+    pdfs = []
+    for href, texto in itens:
+        if apenas_versao_original and not regras.versao_original.search(texto):
+            continue
+        if href and not href.startswith("#") and "javascript" not in href.lower():
+            pdfs.append(urljoin(base_url, href))
+    return pdfs
+
 
+def _escolher_pdfs(candidatos: dict[str, list], base_url: str, apenas_versao_original: bool = False, regras: RegrasLinks | None = None) -> list[str]:
+    pdfs = _filtrar_livros(candidatos["livro"], base_url, apenas_versao_original, regras)
+    if pdfs or apenas_versao_original:
+        return list(set(pdfs))
+
+    for chave in ("pdf", "data", "amplo"):
+        pdfs.extend(urljoin(base_url, href) for href in candidatos[chave])
     return list(set(pdfs))
 
 
-def _criar_driver(download_dir: str | None = None):
+@_medido("extrair_pdfs_html")
+def _extrair_pdfs_html(html: str, base_url: str, apenas_versao_original: bool = False) -> list[str]:
+    regras = regras_para(base_url)
+    return _escolher_pdfs(_coletar_candidatos(html, regras=regras), base_url, apenas_versao_original, regras)
+
+
+class _ColetorIncremental(HTMLParser):
+    """Versão por eventos de _coletar_candidatos, alimentada aos pedaços."""
+
+    def __init__(self, regras: RegrasLinks | None = None):
+        super().__init__(convert_charrefs=True)
+        self.regras = regras or regras_para("")
+        self.candidatos = _novos_candidatos()
+        self._ancoras: list[tuple[dict, list[str]]] = []
+        self._sem_texto = 0
+        self._texto_continuo = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self._texto_continuo = False
+        atributos = {k: v or "" for k, v in attrs}
+        if tag == "a":
+            self._ancoras.append((atributos, []))
+        else:
+            self.regras.classificar(tag, atributos, str, self.candidatos)
+        if tag in _TAGS_SEM_TEXTO:
+            self._sem_texto += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        self._texto_continuo = False
+        if tag in _TAGS_SEM_TEXTO and self._sem_texto:
+            self._sem_texto -= 1
+        elif tag == "a" and self._ancoras:
+            self._fechar_ancora()
+
+    def handle_data(self, data: str) -> None:
+        if self._sem_texto:
+            return
+        for _, partes in self._ancoras:
+            if self._texto_continuo and partes:
+                partes[-1] += data
+            else:
+                partes.append(data)
+        self._texto_continuo = True
+
+    def handle_comment(self, data: str) -> None:
+        self._texto_continuo = False
+
+    def _fechar_ancora(self) -> None:
+        attrs, partes = self._ancoras.pop()
+        self.regras.classificar("a", attrs, lambda: "".join(p.strip() for p in partes), self.candidatos)
+
+    def close(self) -> None:
+        super().close()
+        while self._ancoras:
+            self._fechar_ancora()
+
+
+def encontrar_pdfs_incremental(url: str, sessao: requests.Session | None = None, apenas_versao_original: bool = False, tamanho_bloco: int = 64 * 1024) -> Iterator[str]:
+    # Links "Baixar livro" e .pdf diretos saem assim que aparecem; as heurísticas
+    # mais amplas só são usadas no fim, se nada melhor tiver sido encontrado.
+    sessao = sessao or sessao_compartilhada()
+    try:
+        response = sessao.get(url, timeout=15, stream=True)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Erro ao acessar {url}: {e}")
+        return
+
+    regras = regras_para(url)
+    coletor = _ColetorIncremental(regras)
+    candidatos = coletor.candidatos
+    decodificador = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    vistos: set[str] = set()
+    lidos = {"livro": 0, "pdf": 0}
+    achou_livro = False
+
+    def _novos() -> list[str]:
+        nonlocal achou_livro
+        novos = _filtrar_livros(candidatos["livro"][lidos["livro"]:], url, apenas_versao_original, regras)
+        lidos["livro"] = len(candidatos["livro"])
+        achou_livro = achou_livro or bool(novos)
+        if not achou_livro and not apenas_versao_original:
+            novos += [urljoin(url, href) for href in candidatos["pdf"][lidos["pdf"]:]]
+        lidos["pdf"] = len(candidatos["pdf"])
+        novos = [u for u in dict.fromkeys(novos) if u not in vistos]
+        vistos.update(novos)
+        return novos
+
+    with response:
+        try:
+            for bloco in response.iter_content(chunk_size=tamanho_bloco):
+                coletor.feed(decodificador.decode(bloco))
+                yield from _novos()
+        except requests.RequestException as e:
+            print(f"Erro ao ler {url}: {e}")
+        coletor.feed(decodificador.decode(b"", final=True))
+        coletor.close()
+    yield from _novos()
+
+    if not vistos and not apenas_versao_original:
+        for chave in ("data", "amplo"):
+            for href in candidatos[chave]:
+                link = urljoin(url, href)
+                if link not in vistos:
+                    vistos.add(link)
+                    yield link
+
+
+@_medido("criar_driver")
+def _criar_driver(download_dir: str | None = None, headless: bool = False, perfil: str | None = None):
+    """Abre Brave, Edge ou Chrome. Com `perfil`, usa uma pasta de perfil fixa, que guarda o login entre execuções."""
+    if perfil:
+        try:
+            return _iniciar_navegador(download_dir, headless, perfil)
+        except RuntimeError:
+            # Perfil travado por outro navegador aberto, por exemplo: segue com um perfil temporário.
+            print("  [Aviso] Nao foi possivel usar o perfil salvo do navegador; abrindo sem ele")
+    return _iniciar_navegador(download_dir, headless, None)
+
+
+def _iniciar_navegador(download_dir: str | None, headless: bool, perfil: str | None):
     from selenium import webdriver
     opcoes_comuns = [
         "--disable-blink-features=AutomationControlled",
@@ -101,6 +582,8 @@ def _criar_driver(download_dir: str | None = None):
         "--window-size=1920,1080",
         "--lang=pt-BR",
     ]
+    if headless:
+        opcoes_comuns.append("--headless=new")
     prefs = {}
     if download_dir:
         pasta_abs = os.path.abspath(download_dir)
@@ -113,9 +596,12 @@ def _criar_driver(download_dir: str | None = None):
             "plugins.always_open_pdf_externally": True,
         }
 
-    def _adicionar_opcoes(opts):
+    def _adicionar_opcoes(opts, navegador: str):
         for arg in opcoes_comuns:
             opts.add_argument(arg)
+        if perfil:
+            # Cada navegador tem o próprio formato de perfil; não dá para dividir a mesma pasta.
+            opts.add_argument(f"--user-data-dir={os.path.join(os.path.abspath(perfil), navegador)}")
         if prefs:
             opts.add_experimental_option("prefs", prefs)
 
@@ -131,7 +617,7 @@ def _criar_driver(download_dir: str | None = None):
                 from selenium.webdriver.chrome.options import Options as ChromeOptions
                 opts = ChromeOptions()
                 opts.binary_location = bravo_path
-                _adicionar_opcoes(opts)
+                _adicionar_opcoes(opts, "brave")
                 return webdriver.Chrome(options=opts)
             except Exception:
                 break
@@ -139,7 +625,7 @@ def _criar_driver(download_dir: str | None = None):
     try:
         from selenium.webdriver.edge.options import Options as EdgeOptions
         opts = EdgeOptions()
-        _adicionar_opcoes(opts)
+        _adicionar_opcoes(opts, "edge")
         return webdriver.Edge(options=opts)
     except Exception:
         pass
@@ -147,7 +633,7 @@ def _criar_driver(download_dir: str | None = None):
     try:
         from selenium.webdriver.chrome.options import Options as ChromeOptions
         opts = ChromeOptions()
-        _adicionar_opcoes(opts)
+        _adicionar_opcoes(opts, "chrome")
         return webdriver.Chrome(options=opts)
     except Exception as e:
         raise RuntimeError(
@@ -155,11 +641,141 @@ def _criar_driver(download_dir: str | None = None):
         )
 
 
-def encontrar_pdfs_selenium(url: str, pasta_destino: str = "pdfs", cookies_path: str | None = None) -> tuple[list[str], requests.Session | None, int]:
+# Condições (JavaScript) que indicam que a página já tem o que procuramos.
+ESPERA_LINKS_PDF = "Array.from(document.querySelectorAll('a')).some(a => /baixar/i.test(a.textContent) || /\\.pdf/i.test(a.getAttribute('href') || ''))"
+ESPERA_LINKS_AULAS = "document.querySelector('a[href*=\"/aulas/\"]') !== null"
+ESPERA_VERSAO_ORIGINAL = "Array.from(document.querySelectorAll('a')).some(a => /vers(ã|a)o original/i.test(a.textContent))"
+_ASSINATURA_DOM = "return document.readyState + ':' + document.getElementsByTagName('*').length + ':' + (document.body ? document.body.innerHTML.length : 0)"
+
+TEMPOS_ESPERA: list[tuple[str, float]] = []
+
+
+def _fechar_alerta(driver) -> bool:
+    try:
+        driver.switch_to.alert.accept()
+        return True
+    except Exception:
+        return False
+
+
+def _aguardar_pagina(driver, condicao_js: str | None = None, tempo_maximo: float = TEMPO_MAXIMO_ESPERA, estabilidade_ms: int = ESTABILIDADE_DOM_MS, intervalo: float = 0.2) -> float:
+    inicio = time.monotonic()
+    assinatura_anterior = None
+    estavel_desde = inicio
+    while time.monotonic() - inicio < tempo_maximo:
+        if _fechar_alerta(driver):
+            continue
+        try:
+            if condicao_js and driver.execute_script(f"return !!({condicao_js})"):
+                break
+            assinatura = driver.execute_script(_ASSINATURA_DOM)
+        except Exception:
+            time.sleep(intervalo)
+            continue
+        agora = time.monotonic()
+        if assinatura != assinatura_anterior:
+            assinatura_anterior, estavel_desde = assinatura, agora
+        elif assinatura.startswith("complete:") and (agora - estavel_desde) * 1000 >= estabilidade_ms:
+            break
+        time.sleep(intervalo)
+    _fechar_alerta(driver)
+    gasto = time.monotonic() - inicio
+    try:
+        TEMPOS_ESPERA.append((driver.current_url, gasto))
+    except Exception:
+        TEMPOS_ESPERA.append(("", gasto))
+    return gasto
+
+
+def _carregar_pagina(driver, url: str, condicao_js: str | None = None, tempo_maximo: float = TEMPO_MAXIMO_ESPERA) -> None:
+    with METRICAS.medir("carregar_pagina"):
+        METRICAS.marcar_primeira_requisicao()
+        driver.get(url)
+        _aguardar_pagina(driver, condicao_js, tempo_maximo)
+
+
+def _aguardar_inicio_download(pasta: str, antes: set[str], tempo_maximo: float = TEMPO_MAXIMO_ESPERA, intervalo: float = 0.2) -> bool:
+    inicio = time.monotonic()
+    while time.monotonic() - inicio < tempo_maximo:
+        if set(os.listdir(pasta)) - antes:
+            return True
+        time.sleep(intervalo)
+    return False
+
+
+def _cookie_cdp(cookie) -> dict:
+    c = {
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path or "/",
+        "secure": bool(cookie.secure),
+        "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+    }
+    if cookie.expires:
+        c["expires"] = cookie.expires
+    return c
+
+
+def _injetar_cookies(driver, caminho_cookies: str, base_url: str, avisar: bool = True) -> bool:
+    if not os.path.exists(caminho_cookies):
+        return False
+    try:
+        jar = MozillaCookieJar(caminho_cookies)
+        jar.load(ignore_discard=True)
+    except Exception as e:
+        if avisar:
+            print(f"  [Aviso] Cookies: {e}\n")
+        return False
+    try:
+        # Uma chamada só, sem precisar abrir o site antes (Chrome, Edge e Brave).
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": [_cookie_cdp(cookie) for cookie in jar]})
+    except Exception:
+        # Sem CDP, o WebDriver só aceita cookies do domínio aberto, um de cada vez.
+        driver.get(base_url)
+        for cookie in jar:
+            c = {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain.lstrip(".") if cookie.domain.startswith(".") else cookie.domain,
+            }
+            if cookie.path:
+                c["path"] = cookie.path
+            if cookie.secure:
+                c["secure"] = True
+            try:
+                driver.add_cookie(c)
+            except Exception:
+                pass
+    if avisar:
+        print("  [Sessão logada] Cookies carregados no navegador\n")
+    return True
+
+
+def _copiar_cookies_navegador(cookies: list[dict], sessao: requests.Session) -> None:
+    for c in cookies:
+        sessao.cookies.set(c["name"], c["value"], domain=c.get("domain", ""))
+
+
+def _resumo_esperas(desde: int = 0) -> None:
+    tempos = [t for _, t in TEMPOS_ESPERA[desde:]]
+    if tempos:
+        print(f"  [Espera] {len(tempos)} pagina(s), {sum(tempos):.1f}s no total (max {max(tempos):.1f}s)")
+
+
+def _definir_pasta_download(driver, pasta: str) -> None:
+    # Um navegador do pool foi aberto com outra pasta de download (ou nenhuma); o CDP troca sem reabrir.
+    pasta_abs = os.path.abspath(pasta)
+    os.makedirs(pasta_abs, exist_ok=True)
+    try:
+        driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": pasta_abs})
+    except Exception as e:
+        print(f"  [Aviso] Nao foi possivel mudar a pasta de download do navegador: {e}")
+
+
+def encontrar_pdfs_selenium(url: str, pasta_destino: str = "pdfs", cookies_path: str | None = None, tempo_maximo_espera: float = TEMPO_MAXIMO_ESPERA, perfil: str | None = PASTA_PERFIL_NAVEGADOR, pool: "PoolNavegadores | None" = None) -> tuple[list[str], requests.Session | None, int]:
     try:
         from selenium.webdriver.common.by import By
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
     except ImportError as e:
         print(f"  [Erro] Para modo --browser, instale: pip install selenium webdriver-manager")
         print(f"  Detalhe: {e}")
@@ -170,52 +786,19 @@ def encontrar_pdfs_selenium(url: str, pasta_destino: str = "pdfs", cookies_path:
     base_url = f"https://{dominio}"
 
     driver = None
+    inicio_esperas = len(TEMPOS_ESPERA)
     try:
-        driver = _criar_driver(download_dir=pasta_destino)
-        driver.implicitly_wait(10)
-
-        if os.path.exists(caminho_cookies):
-            driver.get(base_url)
-            try:
-                jar = MozillaCookieJar(caminho_cookies)
-                jar.load(ignore_discard=True)
-                for cookie in jar:
-                    c = {
-                        "name": cookie.name,
-                        "value": cookie.value,
-                        "domain": cookie.domain.lstrip(".") if cookie.domain.startswith(".") else cookie.domain,
-                    }
-                    if cookie.path:
-                        c["path"] = cookie.path
-                    if cookie.secure:
-                        c["secure"] = True
-                    try:
-                        driver.add_cookie(c)
-                    except Exception:
-                        pass
-                print("  [Sessão logada] Cookies carregados no navegador\n")
-            except Exception as e:
-                print(f"  [Aviso] Cookies: {e}\n")
+        if pool:
+            # No lote, o navegador vem do pool compartilhado, que já injeta os cookies do site.
+            driver = pool.emprestar(1, base_url)[0]
+            _definir_pasta_download(driver, pasta_destino)
+        else:
+            driver = _criar_driver(download_dir=pasta_destino, perfil=perfil)
+            driver.implicitly_wait(0)
+            _injetar_cookies(driver, caminho_cookies, base_url)
 
         print("  Navegando para a página (aguarde)...")
-        import time
-        try:
-            from selenium.webdriver.support.ui import WebDriverWait
-            from selenium.webdriver.support import expected_conditions as EC
-        except ImportError:
-            pass
-        def _fechar_alerta(d):
-            try:
-                WebDriverWait(d, 2).until(EC.alert_is_present())
-                d.switch_to.alert.accept()
-                time.sleep(0.5)
-            except Exception:
-                pass
-        driver.get(url)
-        time.sleep(8)
-        _fechar_alerta(driver)
-        time.sleep(1)
-        _fechar_alerta(driver)
+        _carregar_pagina(driver, url, ESPERA_LINKS_PDF, tempo_maximo_espera)
         try:
             html = driver.page_source
         except Exception:
@@ -226,7 +809,6 @@ def encontrar_pdfs_selenium(url: str, pasta_destino: str = "pdfs", cookies_path:
         cliques = 0
         if not pdfs:
             try:
-                from selenium.webdriver.common.by import By
                 botoes = list(driver.find_elements(By.PARTIAL_LINK_TEXT, "Baixar Livro"))
                 vistos = set()
                 for btn in botoes:
@@ -239,8 +821,9 @@ def encontrar_pdfs_selenium(url: str, pasta_destino: str = "pdfs", cookies_path:
                         elif btn.is_displayed() and btn.is_enabled():
                             texto = btn.text.strip()[:50]
                             if texto not in vistos:
+                                antes = set(os.listdir(pasta_destino))
                                 btn.click()
-                                time.sleep(2)
+                                _aguardar_inicio_download(pasta_destino, antes, tempo_maximo_espera)
                                 cliques += 1
                                 vistos.add(texto)
                                 print(f"  [Clique] {texto}... (download via navegador)")
@@ -249,92 +832,308 @@ def encontrar_pdfs_selenium(url: str, pasta_destino: str = "pdfs", cookies_path:
             except Exception as e:
                 print(f"  [Aviso] Busca por botões: {e}")
 
-        sessao = requests.Session()
-        sessao.headers.update(HEADERS)
-        for c in driver.get_cookies():
-            sessao.cookies.set(c["name"], c["value"], domain=c.get("domain", ""))
+        sessao = sessao_compartilhada()
+        _copiar_cookies_navegador(driver.get_cookies(), sessao)
 
+        _resumo_esperas(inicio_esperas)
         return pdfs, sessao, cliques
 
     finally:
-        if driver:
+        if driver and pool:
+            pool.devolver([driver])
+        elif driver:
             driver.quit()
 
 
-def baixar_pdfs_curso(url_curso: str, pasta_destino: str = "pdfs", apenas_aula: int | None = None) -> int:
-    try:
-        from selenium.webdriver.common.by import By
-    except ImportError:
-        print("  [Erro] Instale: pip install selenium")
-        return 0
+def _extrair_pdfs_aula(driver, url_aula: str, tempo_maximo_espera: float = TEMPO_MAXIMO_ESPERA) -> list[str]:
+    from selenium.webdriver.common.by import By
 
-    caminho_cookies = os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_COOKIES)
-    base_url = f"https://{urlparse(url_curso).netloc}"
-    driver = None
+    LIMITADOR.aguardar(url_aula)
+    _carregar_pagina(driver, url_aula, ESPERA_VERSAO_ORIGINAL, tempo_maximo_espera)
 
     try:
-        driver = _criar_driver(download_dir=pasta_destino)
-        driver.implicitly_wait(10)
+        html = driver.page_source
+    except Exception:
+        _fechar_alerta(driver)
+        html = driver.page_source if driver else ""
+    pdfs = _extrair_pdfs_html(html, url_aula, apenas_versao_original=True)
 
-        if os.path.exists(caminho_cookies):
-            driver.get(base_url)
+    if not pdfs:
+        try:
+            _fechar_alerta(driver)
+            botoes = driver.find_elements(By.PARTIAL_LINK_TEXT, "versão original")
+            botoes += driver.find_elements(By.PARTIAL_LINK_TEXT, "versao original")
+        except Exception:
+            _fechar_alerta(driver)
+            botoes = []
+        for btn in botoes:
             try:
-                jar = MozillaCookieJar(caminho_cookies)
-                jar.load(ignore_discard=True)
-                for cookie in jar:
-                    c = {
-                        "name": cookie.name,
-                        "value": cookie.value,
-                        "domain": cookie.domain.lstrip(".") if cookie.domain.startswith(".") else cookie.domain,
-                    }
-                    if cookie.path:
-                        c["path"] = cookie.path
-                    try:
-                        driver.add_cookie(c)
-                    except Exception:
-                        pass
-                print("  [Sessao logada] Cookies carregados\n")
+                parent = btn.find_element(By.XPATH, "./ancestor::a")
+                href = parent.get_attribute("href")
+                if href and href.startswith("http") and "javascript" not in href.lower():
+                    pdfs.append(href)
+                    break
             except Exception:
-                pass
+                try:
+                    href = btn.get_attribute("href")
+                    if href and href.startswith("http"):
+                        pdfs.append(href)
+                        break
+                except Exception:
+                    pass
+    return pdfs
+
+
+def _normalizar_url_aula(href: str, dominio: str, regras: RegrasLinks | None = None) -> str | None:
+    if dominio not in href:
+        return None
+    return (regras or regras_para(href)).normalizar_aula(href)
 
-        print("  Buscando URLs das aulas...")
-        import time
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
 
-        def fechar_alerta(d):
+def _encontrar_aulas_html(html: str, url_curso: str) -> set[str]:
+    # Procura no texto bruto (e não só em <a href>) para pegar também URLs em JSON embutido.
+    dominio = urlparse(url_curso).netloc
+    texto = html.replace("\\/", "/")
+    aulas = set()
+    regras = regras_para(url_curso)
+    for match in regras.caminho_aula.finditer(texto):
+        url_aula = _normalizar_url_aula(urljoin(url_curso, match.group(0)), dominio, regras)
+        if url_aula:
+            aulas.add(url_aula)
+    return aulas
+
+
+def _buscar_html(sessao: requests.Session, url: str) -> str | None:
+    try:
+        with METRICAS.medir("buscar_pagina"):
+            response = sessao.get(url, timeout=15)
+        response.raise_for_status()
+    except requests.RequestException:
+        return None
+    return response.text
+
+
+def _buscar_aula_condicional(sessao: requests.Session, url_aula: str, entrada: dict | None) -> requests.Response | None:
+    """GET da aula com os validadores do cache (304 se não mudou); None se a requisição falhar."""
+    cabecalhos = {}
+    if entrada and entrada.get("etag"):
+        cabecalhos["If-None-Match"] = entrada["etag"]
+    if entrada and entrada.get("last_modified"):
+        cabecalhos["If-Modified-Since"] = entrada["last_modified"]
+    try:
+        with METRICAS.medir("buscar_pagina"):
+            response = sessao.get(url_aula, timeout=15, headers=cabecalhos)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except requests.RequestException:
+        return None
+    return response
+
+
+def _extrair_pdfs_aula_http(sessao: requests.Session, url_aula: str, cache: "CachePaginas | None" = None) -> list[str]:
+    if cache is None:
+        html = _buscar_html(sessao, url_aula)
+        return _extrair_pdfs_html(html, url_aula, apenas_versao_original=True) if html else []
+
+    entrada = cache.procurar(url_aula)
+    response = _buscar_aula_condicional(sessao, url_aula, entrada)
+    if response is None:
+        return []
+    if response.status_code == 304:
+        return (cache.confirmar(url_aula) or []) if entrada else []
+
+    hash_html = hashlib.sha256(response.content).hexdigest()
+    if entrada and entrada.get("hash") == hash_html:
+        links = cache.confirmar(url_aula)
+        if links is not None:
+            return links
+    links = _extrair_pdfs_html(response.text, url_aula, apenas_versao_original=True)
+    cache.gravar(url_aula, links, "http", response.headers.get("ETag"), response.headers.get("Last-Modified"), hash_html)
+    return links
+
+
+def _confirmar_aula_cache(sessao: requests.Session, url_aula: str, cache: "CachePaginas") -> tuple[list[str] | None, tuple]:
+    """Modo navegador: os links guardados, se a requisição condicional confirmar que a página não mudou.
+
+    Se mudou, devolve None e os validadores novos (ETag, Last-Modified, hash), para gravar com o que o navegador achar.
+    """
+    entrada = cache.procurar(url_aula)
+    if not entrada:
+        return None, ()
+    response = _buscar_aula_condicional(sessao, url_aula, entrada)
+    if response is None:
+        return None, ()
+    if response.status_code == 304:
+        return cache.confirmar(url_aula), ()
+    hash_html = hashlib.sha256(response.content).hexdigest()
+    if hash_html == entrada.get("hash"):
+        return cache.confirmar(url_aula), ()
+    return None, (response.headers.get("ETag"), response.headers.get("Last-Modified"), hash_html)
+
+
+def _criar_driver_aulas(pasta_destino: str | None, headless: bool = True, perfil: str | None = None):
+    driver = _criar_driver(download_dir=pasta_destino, headless=headless, perfil=perfil)
+    driver.implicitly_wait(0)
+    return driver
+
+
+class PoolNavegadores:
+    """Navegadores reaproveitados entre aulas e entre cursos. O primeiro é visível, os outros não."""
+
+    def __init__(self, maximo: int = NAVEGADORES_SIMULTANEOS, pasta_destino: str | None = None, cookies_path: str | None = None, perfil: str | None = PASTA_PERFIL_NAVEGADOR):
+        self.maximo = max(1, maximo)
+        self.perfil = perfil
+        self.pasta_destino = pasta_destino
+        self.caminho_cookies = cookies_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_COOKIES)
+        self._todos: list = []
+        self._livres: list = []
+        self._dominios: dict[int, set[str]] = {}
+        self._criando = 0
+        self._cond = threading.Condition()
+
+    def emprestar(self, quantidade: int, base_url: str, bloquear: bool = True) -> list:
+        quantidade = max(1, min(quantidade, self.maximo))
+        with self._cond:
+            while bloquear and not self._livres and len(self._todos) + self._criando >= self.maximo:
+                self._cond.wait()
+            obtidos = self._livres[:quantidade]
+            del self._livres[:len(obtidos)]
+            a_criar = max(0, min(quantidade - len(obtidos), self.maximo - len(self._todos) - self._criando))
+            primeiro_visivel = not self._todos and not self._criando
+            self._criando += a_criar
+
+        novos = []
+        try:
+            if a_criar:
+                with ThreadPoolExecutor(max_workers=a_criar, thread_name_prefix="navegador") as criador:
+                    futuros = [
+                        # Só o navegador visível usa o perfil salvo: um perfil não pode ser aberto por dois ao mesmo tempo.
+                        criador.submit(_criar_driver_aulas, self.pasta_destino, not (primeiro_visivel and n == 0), self.perfil if primeiro_visivel and n == 0 else None)
+                        for n in range(a_criar)
+                    ]
+                for futuro in futuros:
+                    try:
+                        novos.append(futuro.result())
+                    except ImportError:
+                        raise
+                    except Exception as e:
+                        print(f"  [Aviso] Navegador extra nao iniciou: {e}")
+        finally:
+            with self._cond:
+                self._criando -= a_criar
+                self._todos.extend(novos)
+                self._cond.notify_all()
+
+        obtidos += novos
+        if not obtidos and bloquear:
+            raise RuntimeError("Não foi possível iniciar o navegador. Instale Brave, Edge ou Chrome.")
+        for driver in obtidos:
+            dominios = self._dominios.setdefault(id(driver), set())
+            if base_url not in dominios:
+                _injetar_cookies(driver, self.caminho_cookies, base_url, avisar=False)
+                dominios.add(base_url)
+        return obtidos
+
+    def devolver(self, drivers: list) -> None:
+        with self._cond:
+            self._livres.extend(drivers)
+            self._cond.notify_all()
+
+    def fechar(self) -> None:
+        with self._cond:
+            drivers, self._todos, self._livres = self._todos, [], []
+        for driver in drivers:
             try:
-                WebDriverWait(d, 2).until(EC.alert_is_present())
-                d.switch_to.alert.accept()
-                time.sleep(0.5)
+                driver.quit()
             except Exception:
                 pass
 
-        driver.get(url_curso)
-        time.sleep(10)
-        fechar_alerta(driver)
-        time.sleep(2)
-        fechar_alerta(driver)
+    def __enter__(self) -> "PoolNavegadores":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.fechar()
+
+
+def _encontrar_aulas_navegador(driver, url_curso: str, tempo_maximo_espera: float) -> set[str]:
+    from selenium.webdriver.common.by import By
+
+    print("  Buscando URLs das aulas no navegador...")
+    LIMITADOR.aguardar(url_curso)
+    _carregar_pagina(driver, url_curso, ESPERA_LINKS_AULAS, tempo_maximo_espera)
+
+    aulas_urls = set()
+    dominio = urlparse(url_curso).netloc
+    regras = regras_para(url_curso)
+    for tentativa in range(3):
+        try:
+            _fechar_alerta(driver)
+            for a in driver.find_elements(By.TAG_NAME, "a"):
+                url_aula = _normalizar_url_aula(a.get_attribute("href") or "", dominio, regras)
+                if url_aula:
+                    aulas_urls.add(url_aula)
+            if aulas_urls:
+                break
+        except Exception:
+            _aguardar_pagina(driver, ESPERA_LINKS_AULAS, tempo_maximo_espera)
+    return aulas_urls
+
+
+def _raspar_aulas(driver, tarefas: queue.Queue, resultados: queue.Queue, tempo_maximo_espera: float) -> None:
+    while True:
+        try:
+            indice, url_aula = tarefas.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            pdfs = _extrair_pdfs_aula(driver, url_aula, tempo_maximo_espera)
+        except Exception as e:
+            print(f"  [Aviso] Aula {url_aula}: {e}")
+            pdfs = []
+        try:
+            cookies = driver.get_cookies()
+        except Exception:
+            cookies = []
+        resultados.put((indice, url_aula, pdfs, cookies))
+
+
+def baixar_pdfs_curso(url_curso: str, pasta_destino: str = "pdfs", apenas_aula: int | None = None, max_simultaneos: int = MAX_DOWNLOADS_SIMULTANEOS, max_por_host: int = MAX_DOWNLOADS_POR_HOST, tempo_maximo_espera: float = TEMPO_MAXIMO_ESPERA, navegadores: int = NAVEGADORES_SIMULTANEOS, sempre_navegador: bool = False, sessao: requests.Session | None = None, pool: PoolNavegadores | None = None, usar_cache: bool = True, perfil: str | None = PASTA_PERFIL_NAVEGADOR, usar_fila: bool = True, **opcoes_download) -> int:
+    caminho_cookies = os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_COOKIES)
+    base_url = f"https://{urlparse(url_curso).netloc}"
+    pool_proprio = pool is None
+    pool = pool or PoolNavegadores(navegadores, pasta_destino, caminho_cookies, perfil)
+    drivers = []
+    agendador = None
+    ja_baixadas = 0
+    inicio_esperas = len(TEMPOS_ESPERA)
+    cache = abrir_cache_paginas(pasta_destino) if usar_cache else None
+    acertos_antes = cache.acertos if cache else 0
+    fila = abrir_fila(pasta_destino) if usar_fila else None
+
+    def _garantir_drivers(quantidade: int) -> None:
+        from selenium.webdriver.common.by import By  # noqa: F401 (falha cedo se o selenium faltar)
+
+        faltam = min(quantidade, pool.maximo) - len(drivers)
+        if faltam > 0:
+            drivers.extend(pool.emprestar(faltam, base_url, bloquear=not drivers))
+
+    try:
+        # Leitura das aulas e downloads rodam juntos: o pool de conexões precisa comportar os dois.
+        sessao = _preparar_sessao(sessao or carregar_sessao(caminho_cookies), max_simultaneos * 2)
+        agendador = AgendadorDownloads(sessao, max_simultaneos, max_por_host, **opcoes_download)
 
         aulas_urls = set()
-        dominio = urlparse(url_curso).netloc
-        for tentativa in range(3):
+        if not sempre_navegador:
+            print("  Buscando URLs das aulas (sem navegador)...")
+            html_curso = _buscar_html(sessao, url_curso)
+            aulas_urls = _encontrar_aulas_html(html_curso, url_curso) if html_curso else set()
+        if not aulas_urls:
             try:
-                fechar_alerta(driver)
-                for a in driver.find_elements(By.TAG_NAME, "a"):
-                    href = a.get_attribute("href") or ""
-                    if "/aulas/" in href and dominio in href:
-                        match = re.search(r"(https://[^/]+/[^/]+/cursos/\d+/aulas/\d+)", href)
-                        if not match:
-                            match = re.search(r"(https://[^/]+/app/dashboard/cursos/\d+/aulas/\d+)", href)
-                        if match:
-                            aulas_urls.add(match.group(1))
-                if aulas_urls:
-                    break
-            except Exception:
-                fechar_alerta(driver)
-                time.sleep(2)
-                pass
+                _garantir_drivers(1)
+            except ImportError:
+                print("  [Erro] Instale: pip install selenium")
+                return 0
+            aulas_urls = _encontrar_aulas_navegador(drivers[0], url_curso, tempo_maximo_espera)
 
         aulas_lista = sorted(aulas_urls)
         if not aulas_lista:
@@ -345,70 +1144,875 @@ def baixar_pdfs_curso(url_curso: str, pasta_destino: str = "pdfs", apenas_aula:
             if apenas_aula < 1 or apenas_aula > len(aulas_lista):
                 print(f"  [Erro] Aula {apenas_aula} inexistente (1 a {len(aulas_lista)}).")
                 return 0
-            aulas_lista = [aulas_lista[apenas_aula - 1]]
+            numeradas = [(apenas_aula, aulas_lista[apenas_aula - 1])]
             print(f"  Baixando apenas Aula {apenas_aula:02d} (versao original)\n")
         else:
+            numeradas = list(enumerate(aulas_lista, start=1))
             print(f"  Encontradas {len(aulas_lista)} aula(s) - apenas versao original\n")
 
-        sessao = requests.Session()
-        sessao.headers.update(HEADERS)
-        total = 0
-
-        for i, url_aula in enumerate(aulas_lista):
-            num_aula = f"{(apenas_aula if apenas_aula is not None else i + 1):02d}"
-            print(f"\n  Aula {num_aula}")
-            driver.get(url_aula)
-            time.sleep(5)
-            fechar_alerta(driver)
-            time.sleep(1)
-            fechar_alerta(driver)
+        manifesto = abrir_manifesto(pasta_destino)
+        aulas_fila: dict[str, dict] = {}
+        pdfs_fila: dict[str, list[dict]] = {}
+        if fila:
+            # Execução anterior completa: esta recomeça (e confere atualizações); incompleta: continua de onde parou.
+            if fila.terminou(url_curso):
+                fila.reiniciar(url_curso)
+            fila.registrar_aulas(url_curso, numeradas)
+            aulas_fila = fila.itens("aula", url_curso)
+            for item in fila.itens("pdf", url_curso).values():
+                pdfs_fila.setdefault(item["origem"], []).append(item)
+
+        def _baixar(link: str, url_aula: str, arquivo: str) -> bool:
+            ao_terminar = None
+            if fila:
+                chave = FilaTrabalho.chave_pdf(url_aula, link)
+                if not fila.reservar("pdf", chave):
+                    return False
+                ao_terminar = lambda ok: fila.finalizar("pdf", chave, ok, "download falhou")
+            agendador.enviar(link, pasta_destino, nome_sugerido=arquivo, origem=url_aula, ao_terminar=ao_terminar)
+            return True
 
+        a_ler = []
+        for indice, url_aula in numeradas:
+            registro_aula = manifesto.procurar_origem(url_aula) if opcoes_download.get("pular_conhecidos") else None
+            if registro_aula:
+                print(f"  Aula {indice:02d}: [OK] Ja baixado: {registro_aula['arquivo']}")
+                ja_baixadas += 1
+                if fila:
+                    # Pulada pelo manifesto, mas feita: sem isso a fila acharia que a execução ficou incompleta.
+                    fila.concluir_aula(url_curso, url_aula, indice, [(registro_aula["url"], registro_aula["arquivo"])], ja_baixados=True)
+                continue
+            if aulas_fila.get(url_aula, {}).get("estado") == FilaTrabalho.CONCLUIDO:
+                # Aula já lida numa execução interrompida: não é lida de novo, mas os PDFs dela voltam
+                # para os downloads; os já baixados só passam pela requisição condicional do baixar_pdf.
+                for item in pdfs_fila.get(url_aula, []):
+                    ja_concluido = item["estado"] == FilaTrabalho.CONCLUIDO and manifesto.procurar(item["link"], item["arquivo"])
+                    fila.reabrir("pdf", item["chave"])
+                    if _baixar(item["link"], url_aula, item["arquivo"]):
+                        if not ja_concluido:
+                            print(f"  Aula {indice:02d}: retomando {item['arquivo']}")
+                    else:
+                        print(f"  Aula {indice:02d}: {item['arquivo']} em andamento em outro processo")
+                continue
+            a_ler.append((indice, url_aula))
+
+        def _enviar(indice: int, url_aula: str, pdfs: list[str]) -> None:
+            num_aula = f"{indice:02d}"
+            print(f"  Aula {num_aula}: {len(pdfs[:1])} PDF(s)")
+            escolhidos = [(link, f"Aula_{num_aula}.pdf") for link in pdfs[:1]]
+            if fila and escolhidos:
+                fila.concluir_aula(url_curso, url_aula, indice, escolhidos)
+            elif fila:
+                fila.finalizar("aula", url_aula, False, FilaTrabalho.ERRO_SEM_PDF)
+            for link, arquivo in escolhidos:
+                if not _baixar(link, url_aula, arquivo):
+                    print(f"  Aula {num_aula}: {arquivo} em andamento em outro processo")
+
+        def _ler_http(item: tuple[int, str]) -> list[str] | None:
+            # A reserva acontece quando a leitura começa, para outro processo poder pegar as aulas seguintes.
+            if fila and not fila.reservar("aula", item[1]):
+                return None
+            return _extrair_pdfs_aula_http(sessao, item[1], cache)
+
+        tarefas: queue.Queue = queue.Queue()
+        validadores: dict[str, tuple] = {}
+        if sempre_navegador:
+            reservadas = []
+            for indice, url_aula in a_ler:
+                if fila and not fila.reservar("aula", url_aula):
+                    print(f"  Aula {indice:02d}: em andamento em outro processo")
+                    continue
+                reservadas.append((indice, url_aula))
+            # O cache só evita o navegador se o servidor confirmar (requisição condicional) que a aula não mudou.
+            with ThreadPoolExecutor(max_workers=max(1, max_simultaneos), thread_name_prefix="aula") as leitor:
+                confirmados = leitor.map(lambda item: _confirmar_aula_cache(sessao, item[1], cache) if cache else (None, ()), reservadas)
+                for (indice, url_aula), (pdfs, novos) in zip(reservadas, confirmados):
+                    if pdfs:
+                        _enviar(indice, url_aula, pdfs)
+                    else:
+                        validadores[url_aula] = novos
+                        tarefas.put((indice, url_aula))
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, max_simultaneos), thread_name_prefix="aula") as leitor:
+                achados = leitor.map(_ler_http, a_ler)
+                for (indice, url_aula), pdfs in zip(a_ler, achados):
+                    if pdfs is None:
+                        print(f"  Aula {indice:02d}: em andamento em outro processo")
+                    elif pdfs:
+                        _enviar(indice, url_aula, pdfs)
+                    else:
+                        tarefas.put((indice, url_aula))
+        pendentes = tarefas.qsize()
+
+        if pendentes:
             try:
-                html = driver.page_source
-            except Exception:
-                fechar_alerta(driver)
-                html = driver.page_source if driver else ""
-            pdfs = _extrair_pdfs_html(html, url_aula, apenas_versao_original=True)
+                _garantir_drivers(pendentes)
+            except ImportError:
+                print("  [Erro] Instale: pip install selenium")
+                return ja_baixadas + sum(agendador.concluir())
+            except RuntimeError as e:
+                # Sem navegador, só as aulas que precisavam dele ficam de fora; os downloads já enviados seguem.
+                print(f"  [Aviso] {e} {pendentes} aula(s) nao lida(s).")
+                return ja_baixadas + sum(agendador.concluir())
+            print(f"  Lendo {pendentes} aula(s) com {len(drivers)} navegador(es)\n")
+
+        resultados: queue.Queue = queue.Queue()
+        raspadores = [
+            threading.Thread(target=_raspar_aulas, args=(d, tarefas, resultados, tempo_maximo_espera), daemon=True)
+            for d in drivers
+        ] if pendentes else []
+        for raspador in raspadores:
+            raspador.start()
+
+        # O número da aula vem da posição na lista ordenada, não da ordem em que a página terminou.
+        for _ in range(pendentes):
+            indice, url_aula, pdfs, cookies = resultados.get()
+            _copiar_cookies_navegador(cookies, sessao)
+            if cache and pdfs:
+                cache.gravar(url_aula, pdfs, "navegador", *validadores.get(url_aula, ()))
+            _enviar(indice, url_aula, pdfs)
+
+        for raspador in raspadores:
+            raspador.join()
+        _resumo_esperas(inicio_esperas)
+        if cache and cache.acertos > acertos_antes:
+            print(f"  [Cache] {cache.acertos - acertos_antes} aula(s) sem alteracoes desde a ultima execucao")
+        return ja_baixadas + sum(agendador.concluir())
 
-            if not pdfs:
-                try:
-                    fechar_alerta(driver)
-                    botoes = driver.find_elements(By.PARTIAL_LINK_TEXT, "versão original")
-                    botoes += driver.find_elements(By.PARTIAL_LINK_TEXT, "versao original")
-                except Exception:
-                    fechar_alerta(driver)
-                    botoes = []
-                for btn in botoes:
+    except Exception as e:
+        print(f"  [Erro] {e}")
+        # Os downloads já enviados terminam mesmo assim; eles entram na contagem.
+        return ja_baixadas + (sum(agendador.concluir()) if agendador else 0)
+    finally:
+        pool.devolver(drivers)
+        if pool_proprio:
+            pool.fechar()
+        if agendador:
+            agendador.concluir()
+        if cache:
+            cache.salvar()
+        if fila:
+            fila.liberar(url_curso)
+            # Em andamento aqui só sobra o que está com outro processo vivo; não é trabalho perdido.
+            faltam = fila.faltando(url_curso)
+            if any(faltam.values()):
+                print(f"  [Fila] Faltam {faltam.get('aula', 0)} aula(s) e {faltam.get('pdf', 0)} PDF(s); rode de novo para continuar de onde parou")
+
+
+class Manifesto:
+    """Registro (JSON lines) do que já foi baixado em uma pasta de destino."""
+
+    def __init__(self, pasta: str):
+        self.pasta = pasta
+        self.caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+        self._por_url: dict[str, dict] = {}
+        self._por_arquivo: dict[str, dict] = {}
+        self._por_origem: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.caminho):
+            with open(self.caminho, encoding="utf-8") as f:
+                for linha in f:
                     try:
-                        parent = btn.find_element(By.XPATH, "./ancestor::a")
-                        href = parent.get_attribute("href")
-                        if href and href.startswith("http") and "javascript" not in href.lower():
-                            pdfs.append(href)
-                            break
-                    except Exception:
-                        try:
-                            href = btn.get_attribute("href")
-                            if href and href.startswith("http"):
-                                pdfs.append(href)
-                                break
-                        except Exception:
-                            pass
+                        self._indexar(json.loads(linha))
+                    except ValueError:
+                        continue
+
+    def _indexar(self, registro: dict) -> None:
+        self._por_url[registro["url"]] = registro
+        self._por_arquivo[registro["arquivo"]] = registro
+        if registro.get("origem"):
+            self._por_origem[registro["origem"]] = registro
+
+    def _valido(self, registro: dict | None) -> dict | None:
+        if not registro:
+            return None
+        caminho = os.path.join(self.pasta, registro["arquivo"])
+        if not os.path.exists(caminho) or os.path.getsize(caminho) != registro.get("tamanho"):
+            return None
+        return registro
+
+    def procurar(self, url: str, arquivo: str | None = None) -> dict | None:
+        # Com nome de arquivo, só o nome vale: várias aulas podem apontar para a mesma URL,
+        # e a URL de uma aula pode mudar entre execuções (links assinados).
+        with self._lock:
+            registro = self._por_arquivo.get(arquivo) if arquivo else self._por_url.get(url)
+        return self._valido(registro)
+
+    def procurar_origem(self, origem: str) -> dict | None:
+        with self._lock:
+            registro = self._por_origem.get(origem)
+        return self._valido(registro)
+
+    def registrar(self, url: str, arquivo: str, tamanho: int, etag: str | None, last_modified: str | None, sha256: str, origem: str | None = None) -> None:
+        registro = {
+            "url": url,
+            "arquivo": arquivo,
+            "tamanho": tamanho,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": sha256,
+            "origem": origem,
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._indexar(registro)
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
 
-            for c in driver.get_cookies():
-                sessao.cookies.set(c["name"], c["value"], domain=c.get("domain", ""))
+_MANIFESTOS: dict[str, Manifesto] = {}
+_MANIFESTOS_LOCK = threading.Lock()
 
-            for link in pdfs[:1]:
-                if baixar_pdf(link, pasta_destino, sessao, nome_sugerido=f"Aula_{num_aula}.pdf"):
-                    total += 1
 
-        return total
+def abrir_manifesto(pasta: str) -> Manifesto:
+    chave = os.path.abspath(pasta)
+    with _MANIFESTOS_LOCK:
+        if chave not in _MANIFESTOS:
+            os.makedirs(chave, exist_ok=True)
+            _MANIFESTOS[chave] = Manifesto(pasta)
+        return _MANIFESTOS[chave]
 
+
+class ArmazemBlobs:
+    """Guarda uma cópia de cada PDF por SHA-256 e liga (hardlink) as cópias nas pastas dos cursos."""
+
+    def __init__(self, raiz: str):
+        self.raiz = raiz
+        self.caminho_indice = os.path.join(raiz, ARQUIVO_INDICE_BLOBS)
+        self._por_assinatura: dict[str, str] = {}
+        self._lock = threading.Lock()
+        os.makedirs(raiz, exist_ok=True)
+        if os.path.exists(self.caminho_indice):
+            with open(self.caminho_indice, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except ValueError:
+                        continue
+                    self._por_assinatura[registro["assinatura"]] = registro["sha256"]
+
+    @staticmethod
+    def _assinatura(tamanho: int | str | None, etag: str | None) -> str | None:
+        if not tamanho or not etag:
+            return None
+        return f"{tamanho}:{etag}"
+
+    def caminho_blob(self, sha256: str) -> str:
+        return os.path.join(self.raiz, sha256[:2], f"{sha256}.pdf")
+
+    def procurar(self, tamanho: int | str | None, etag: str | None) -> str | None:
+        assinatura = self._assinatura(tamanho, etag)
+        with self._lock:
+            sha256 = self._por_assinatura.get(assinatura) if assinatura else None
+        if sha256 and os.path.exists(self.caminho_blob(sha256)):
+            return sha256
+        return None
+
+    def ligar(self, sha256: str, destino: str) -> None:
+        origem = self.caminho_blob(sha256)
+        temporario = destino + ".link"
+        _remover(temporario)
+        try:
+            os.link(origem, temporario)
+        except OSError:
+            # Outro disco ou sistema de arquivos sem hardlink: cai para cópia.
+            shutil.copy2(origem, temporario)
+        os.replace(temporario, destino)
+
+    def incorporar(self, caminho: str, sha256: str, etag: str | None = None) -> bool:
+        blob = self.caminho_blob(sha256)
+        tamanho = os.path.getsize(caminho)
+        with self._lock:
+            ja_existia = os.path.exists(blob)
+            if not ja_existia:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                try:
+                    os.link(caminho, blob)
+                except OSError:
+                    shutil.copy2(caminho, blob)
+            assinatura = self._assinatura(tamanho, etag)
+            if assinatura and self._por_assinatura.get(assinatura) != sha256:
+                self._por_assinatura[assinatura] = sha256
+                with open(self.caminho_indice, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"assinatura": assinatura, "sha256": sha256}) + "\n")
+        if ja_existia:
+            self.ligar(sha256, caminho)
+        return ja_existia
+
+    def descartar(self, sha256: str) -> None:
+        # O índice continua apontando para o SHA, mas procurar() ignora blobs que não existem mais.
+        with self._lock:
+            _remover(self.caminho_blob(sha256))
+
+
+_ARMAZENS: dict[str, ArmazemBlobs] = {}
+_ARMAZENS_LOCK = threading.Lock()
+
+
+def abrir_armazem(raiz: str) -> ArmazemBlobs:
+    chave = os.path.abspath(raiz)
+    with _ARMAZENS_LOCK:
+        if chave not in _ARMAZENS:
+            _ARMAZENS[chave] = ArmazemBlobs(raiz)
+        return _ARMAZENS[chave]
+
+
+class CachePaginas:
+    """Links de PDF extraídos de cada página de aula, com os validadores HTTP e o hash do HTML.
+
+    Fica num JSON na pasta de destino e guarda no máximo MAX_CACHE_PAGINAS páginas,
+    descartando as usadas há mais tempo.
+    """
+
+    def __init__(self, pasta: str, max_entradas: int = MAX_CACHE_PAGINAS):
+        self.caminho = os.path.join(pasta, ARQUIVO_CACHE_PAGINAS)
+        self.max_entradas = max_entradas
+        self.acertos = 0
+        self._entradas: dict[str, dict] = {}
+        self._alterado = False
+        self._lock = threading.Lock()
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                self._entradas = json.load(f)
+        except (OSError, ValueError):
+            self._entradas = {}
+
+    def procurar(self, url: str) -> dict | None:
+        with self._lock:
+            entrada = self._entradas.get(url)
+            return dict(entrada) if entrada else None
+
+    def confirmar(self, url: str) -> list[str] | None:
+        """A página não mudou: devolve os links guardados, se ainda valerem."""
+        with self._lock:
+            entrada = self._entradas.get(url)
+            if not entrada:
+                return None
+            # Páginas montadas por JavaScript podem mudar sem o HTML mudar; o que veio do navegador expira.
+            if entrada["origem"] == "navegador" and time.time() - entrada["gerado"] > VALIDADE_CACHE_NAVEGADOR:
+                return None
+            entrada["usado"] = time.time()
+            self._alterado = True
+            if entrada["links"]:
+                self.acertos += 1
+            return list(entrada["links"])
+
+    def gravar(self, url: str, links: list[str], origem: str = "http", etag: str | None = None, last_modified: str | None = None, hash_html: str | None = None) -> None:
+        agora = time.time()
+        with self._lock:
+            anterior = self._entradas.get(url, {})
+            if origem == "navegador":
+                # Mantém os validadores do HTML para a próxima execução reconhecer a página sem abrir o navegador.
+                etag = etag or anterior.get("etag")
+                last_modified = last_modified or anterior.get("last_modified")
+                hash_html = hash_html or anterior.get("hash")
+            self._entradas[url] = {
+                "links": list(links), "origem": origem, "etag": etag, "last_modified": last_modified,
+                "hash": hash_html, "gerado": agora, "usado": agora,
+            }
+            self._alterado = True
+            if len(self._entradas) > self.max_entradas:
+                for antiga in sorted(self._entradas, key=lambda u: self._entradas[u]["usado"])[:len(self._entradas) - self.max_entradas]:
+                    del self._entradas[antiga]
+
+    def salvar(self) -> None:
+        with self._lock:
+            if not self._alterado:
+                return
+            temporario = self.caminho + ".tmp"
+            try:
+                with open(temporario, "w", encoding="utf-8") as f:
+                    json.dump(self._entradas, f, ensure_ascii=False)
+                os.replace(temporario, self.caminho)
+                self._alterado = False
+            except OSError as e:
+                print(f"  [Aviso] Nao foi possivel salvar o cache de paginas: {e}")
+
+
+_CACHES_PAGINAS: dict[str, CachePaginas] = {}
+_CACHES_PAGINAS_LOCK = threading.Lock()
+
+
+def abrir_cache_paginas(pasta: str) -> CachePaginas:
+    chave = os.path.abspath(pasta)
+    with _CACHES_PAGINAS_LOCK:
+        if chave not in _CACHES_PAGINAS:
+            os.makedirs(chave, exist_ok=True)
+            _CACHES_PAGINAS[chave] = CachePaginas(pasta)
+        return _CACHES_PAGINAS[chave]
+
+
+class FilaTrabalho:
+    """Fila durável (SQLite) das aulas e PDFs de cada curso de uma pasta de destino.
+
+    Cada item vai de pendente para em_andamento e termina em concluido ou falhou. Uma nova
+    execução retoma do ponto em que a anterior parou, e vários processos podem esvaziar a
+    mesma fila ao mesmo tempo: cada item é reservado por um só dono. Os processos dão sinal
+    de vida a cada INTERVALO_BATIMENTO_FILA segundos; os itens em andamento de quem parou
+    de dar sinal (travou, foi fechado) voltam a ficar disponíveis.
+    """
+
+    PENDENTE, EM_ANDAMENTO, CONCLUIDO, FALHOU = "pendente", "em_andamento", "concluido", "falhou"
+    ERRO_SEM_PDF = "nenhum PDF encontrado"
+
+    def __init__(self, pasta: str, intervalo_batimento: float = INTERVALO_BATIMENTO_FILA):
+        import sqlite3
+
+        self.caminho = os.path.join(pasta, ARQUIVO_FILA)
+        self.dono = f"{os.getpid()}-{os.urandom(4).hex()}"
+        self.intervalo_batimento = intervalo_batimento
+        self._lock = threading.Lock()
+        # Sem transações implícitas: as reservas usam BEGIN IMMEDIATE para travar a escrita entre processos.
+        self._conexao = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conexao.row_factory = sqlite3.Row
+        with self._lock:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS itens ("
+                " tipo TEXT, chave TEXT, curso TEXT, indice INTEGER, origem TEXT, arquivo TEXT,"
+                " estado TEXT, dono TEXT, tentativas INTEGER DEFAULT 0, erro TEXT, atualizado REAL, link TEXT,"
+                " PRIMARY KEY (tipo, chave))"
+            )
+            if "link" not in {coluna["name"] for coluna in self._conexao.execute("PRAGMA table_info(itens)")}:
+                # Fila de uma versão anterior, em que o PDF era identificado só pelo link: os itens de PDF
+                # são descartados e as aulas já lidas voltam a pendente, para refazê-los com a chave nova.
+                self._conexao.execute("ALTER TABLE itens ADD COLUMN link TEXT")
+                self._conexao.execute("DELETE FROM itens WHERE tipo = 'pdf'")
+                self._conexao.execute("UPDATE itens SET estado = ?, dono = NULL WHERE tipo = 'aula' AND estado = ?", (self.PENDENTE, self.CONCLUIDO))
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS itens_curso ON itens (tipo, curso, estado)")
+            self._conexao.execute("CREATE TABLE IF NOT EXISTS trabalhadores (dono TEXT PRIMARY KEY, batimento REAL)")
+        self._bater()
+        threading.Thread(target=self._bater_sempre, name="fila-batimento", daemon=True).start()
+
+    @contextmanager
+    def _transacao(self):
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conexao
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._conexao.execute("COMMIT")
+
+    def _bater(self) -> None:
+        with self._transacao() as conexao:
+            conexao.execute("INSERT OR REPLACE INTO trabalhadores VALUES (?, ?)", (self.dono, time.time()))
+
+    def _bater_sempre(self) -> None:
+        while True:
+            time.sleep(self.intervalo_batimento)
+            try:
+                self._bater()
+            except Exception as e:
+                print(f"  [Aviso] Fila de trabalho sem sinal de vida: {e}")
+
+    def registrar_aulas(self, curso: str, numeradas: list[tuple[int, str]]) -> None:
+        agora = time.time()
+        with self._transacao() as conexao:
+            conexao.executemany(
+                "INSERT INTO itens (tipo, chave, curso, indice, estado, atualizado) VALUES ('aula', ?, ?, ?, ?, ?)"
+                " ON CONFLICT (tipo, chave) DO UPDATE SET indice = excluded.indice, curso = excluded.curso",
+                [(url, curso, indice, self.PENDENTE, agora) for indice, url in numeradas],
+            )
+
+    @staticmethod
+    def chave_pdf(url_aula: str, link: str) -> str:
+        # Aula e link juntos: várias aulas podem apontar para o mesmo PDF, e cada uma tem o seu arquivo.
+        return f"{url_aula} {link}"
+
+    def concluir_aula(self, curso: str, url_aula: str, indice: int, pdfs: list[tuple[str, str]], ja_baixados: bool = False) -> None:
+        """Marca a aula como lida e cria, na mesma transação, um item para cada (link, arquivo) encontrado.
+
+        Com ja_baixados (aula pulada pelo manifesto), os PDFs também entram como concluídos.
+        """
+        agora = time.time()
+        estado = self.CONCLUIDO if ja_baixados else self.PENDENTE
+        with self._transacao() as conexao:
+            conexao.executemany(
+                "INSERT INTO itens (tipo, chave, curso, indice, origem, arquivo, link, estado, atualizado) VALUES ('pdf', ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (tipo, chave) DO UPDATE SET arquivo = excluded.arquivo, indice = excluded.indice"
+                + (", estado = excluded.estado, dono = NULL, erro = NULL" if ja_baixados else ""),
+                [(self.chave_pdf(url_aula, link), curso, indice, url_aula, arquivo, link, estado, agora) for link, arquivo in pdfs],
+            )
+            conexao.execute(
+                "UPDATE itens SET estado = ?, dono = NULL, erro = NULL, atualizado = ? WHERE tipo = 'aula' AND chave = ?",
+                (self.CONCLUIDO, agora, url_aula),
+            )
+
+    def itens(self, tipo: str, curso: str) -> dict[str, dict]:
+        with self._lock:
+            linhas = self._conexao.execute("SELECT * FROM itens WHERE tipo = ? AND curso = ?", (tipo, curso)).fetchall()
+        return {linha["chave"]: dict(linha) for linha in linhas}
+
+    def reservar(self, tipo: str, chave: str) -> bool:
+        """Reserva o item para este processo; False se já foi concluído ou outro processo vivo está com ele."""
+        agora = time.time()
+        with self._transacao() as conexao:
+            cursor = conexao.execute(
+                "UPDATE itens SET estado = ?, dono = ?, tentativas = tentativas + 1, atualizado = ?"
+                " WHERE tipo = ? AND chave = ? AND (estado IN (?, ?) OR (estado = ? AND dono NOT IN"
+                " (SELECT dono FROM trabalhadores WHERE batimento > ?)))",
+                (
+                    self.EM_ANDAMENTO, self.dono, agora, tipo, chave, self.PENDENTE, self.FALHOU,
+                    self.EM_ANDAMENTO, agora - PRAZO_BATIMENTO_FILA,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def finalizar(self, tipo: str, chave: str, ok: bool, erro: str | None = None) -> None:
+        with self._transacao() as conexao:
+            conexao.execute(
+                "UPDATE itens SET estado = ?, dono = NULL, erro = ?, atualizado = ? WHERE tipo = ? AND chave = ? AND dono = ?",
+                (self.CONCLUIDO if ok else self.FALHOU, None if ok else erro, time.time(), tipo, chave, self.dono),
+            )
+
+    def reabrir(self, tipo: str, chave: str) -> None:
+        """Volta um item concluído para pendente (ex.: o arquivo foi apagado depois)."""
+        with self._transacao() as conexao:
+            conexao.execute(
+                "UPDATE itens SET estado = ?, atualizado = ? WHERE tipo = ? AND chave = ? AND estado = ?",
+                (self.PENDENTE, time.time(), tipo, chave, self.CONCLUIDO),
+            )
+
+    def faltando(self, curso: str) -> dict[str, int]:
+        """Itens pendentes ou que falharam, por tipo. Aula sem PDF não entra: falharia de novo em toda execução."""
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT tipo, COUNT(*) FROM itens WHERE curso = ? AND (estado = ? OR (estado = ? AND NOT (tipo = 'aula' AND erro IS ?)))"
+                " GROUP BY tipo",
+                (curso, self.PENDENTE, self.FALHOU, self.ERRO_SEM_PDF),
+            ).fetchall()
+        return dict(linhas)
+
+    def terminou(self, curso: str) -> bool:
+        """A última execução do curso chegou ao fim: há itens, nenhum em andamento e nada faltando."""
+        estados = self.resumo(curso)
+        return bool(estados) and not any(FilaTrabalho.EM_ANDAMENTO in por_tipo for por_tipo in estados.values()) and not any(self.faltando(curso).values())
+
+    def reiniciar(self, curso: str) -> None:
+        with self._transacao() as conexao:
+            conexao.execute("UPDATE itens SET estado = ?, dono = NULL, erro = NULL WHERE curso = ?", (self.PENDENTE, curso))
+
+    def liberar(self, curso: str) -> None:
+        """Devolve para pendente o que este processo reservou e não terminou (erro, Ctrl+C)."""
+        with self._transacao() as conexao:
+            conexao.execute(
+                "UPDATE itens SET estado = ?, dono = NULL WHERE curso = ? AND estado = ? AND dono = ?",
+                (self.PENDENTE, curso, self.EM_ANDAMENTO, self.dono),
+            )
+
+    def resumo(self, curso: str) -> dict[str, dict[str, int]]:
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT tipo, estado, COUNT(*) FROM itens WHERE curso = ? GROUP BY tipo, estado", (curso,)
+            ).fetchall()
+        resumo: dict[str, dict[str, int]] = {}
+        for tipo, estado, quantidade in linhas:
+            resumo.setdefault(tipo, {})[estado] = quantidade
+        return resumo
+
+
+_FILAS: dict[str, FilaTrabalho] = {}
+_FILAS_LOCK = threading.Lock()
+
+
+def abrir_fila(pasta: str) -> FilaTrabalho:
+    chave = os.path.abspath(pasta)
+    with _FILAS_LOCK:
+        if chave not in _FILAS:
+            os.makedirs(chave, exist_ok=True)
+            _FILAS[chave] = FilaTrabalho(pasta)
+        return _FILAS[chave]
+
+
+RE_VERSAO_PDF = re.compile(rb"%PDF-(\d\.\d)")
+RE_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+RE_INFO_PDF = re.compile(rb"/Info\s+(\d+)\s+(\d+)\s+R")
+RE_TITULO_PDF = re.compile(rb"/Title\s*(?:\(((?:[^()\\]|\\.)*)\)|<([0-9A-Fa-f\s]*)>)", re.S)
+RE_PAGINA_PDF = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+RE_INICIO_STREAM = re.compile(rb"(?<!end)stream\r?\n")
+RE_BLOCO_TEXTO_PDF = re.compile(rb"\bBT\b(.*?)\bET\b", re.S)
+RE_STRING_PDF = re.compile(rb"\(((?:[^()\\]|\\.)*)\)|<([0-9A-Fa-f\s]+)>", re.S)
+_ESCAPES_PDF = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"\n": b"", b"\r": b""}
+_STREAMS_SEM_TEXTO = (b"/Image", b"/Length1", b"/Type1C", b"/CIDFontType0C", b"/OpenType", b"/Metadata", b"/XRef")
+
+
+def _decodificar_string_pdf(bruto: bytes, hexadecimal: bool = False) -> str:
+    if hexadecimal:
+        digitos = re.sub(rb"\s", b"", bruto).decode("ascii")
+        bruto = bytes.fromhex(digitos + "0" * (len(digitos) % 2))
+    else:
+        bruto = re.sub(
+            rb"\\([0-7]{1,3}|.)",
+            lambda m: bytes([int(m.group(1), 8) & 0xFF]) if m.group(1)[:1].isdigit() else _ESCAPES_PDF.get(m.group(1), m.group(1)),
+            bruto, flags=re.S,
+        )
+    if bruto.startswith(b"\xfe\xff"):
+        return bruto[2:].decode("utf-16-be", "replace")
+    return bruto.decode("latin-1")
+
+
+def _streams_pdf(dados) -> Iterator[tuple[bytes, bytes]]:
+    """Dicionário e conteúdo (descomprimido se for Flate) dos streams que podem ter texto ou objetos."""
+    for m in RE_INICIO_STREAM.finditer(dados):
+        fim = dados.find(b"endstream", m.end())
+        if fim < 0:
+            break
+        dicionario = dados[max(0, m.start() - 512):m.start()]
+        dicionario = dicionario[dicionario.rfind(b" obj") + 4:]
+        if any(marca in dicionario for marca in _STREAMS_SEM_TEXTO):
+            continue
+        bruto = dados[m.end():fim]
+        if b"/FlateDecode" in dicionario:
+            try:
+                conteudo = zlib.decompressobj().decompress(bruto, LIMITE_STREAM_PDF)
+            except zlib.error:
+                continue
+        elif b"/Filter" in dicionario:
+            continue
+        else:
+            conteudo = bruto
+        yield dicionario, conteudo
+
+
+def _conferir_estrutura_pdf(dados, info: dict) -> str | None:
+    cabecalho = dados[:1024]
+    versao = RE_VERSAO_PDF.search(cabecalho)
+    if not versao:
+        return "sem cabecalho %PDF (pagina HTML?)" if b"<html" in cabecalho.lower() else "sem cabecalho %PDF"
+    info["versao"] = versao.group(1).decode("ascii")
+    cauda = dados[-2048:]
+    if b"%%EOF" not in cauda:
+        return "arquivo truncado (sem %%EOF)"
+    referencias = RE_STARTXREF.findall(cauda)
+    if not referencias:
+        return "sem startxref"
+    # O deslocamento conta a partir do %PDF; alguns servidores colocam lixo antes dele.
+    posicao = int(referencias[-1]) + versao.start()
+    trecho = dados[posicao:posicao + 64]
+    if trecho.lstrip().startswith(b"xref") or re.match(rb"\s*\d+\s+\d+\s+obj", trecho):
+        return None
+    # Deslocamento errado é comum e os leitores de PDF reconstroem a tabela; só falta de xref é defeito.
+    if dados.rfind(b"xref") < 0 and dados.rfind(b"/XRef") < 0:
+        return "sem tabela xref"
+    return None
+
+
+def _metadados_pdf_bruto(dados, info: dict) -> str:
+    """Sem pypdf: páginas contadas pelos objetos /Page e texto dos primeiros streams de conteúdo."""
+    paginas = len(RE_PAGINA_PDF.findall(dados))
+    textos: list[str] = []
+    tamanho = 0
+    for dicionario, conteudo in _streams_pdf(dados):
+        if b"/ObjStm" in dicionario:
+            # PDF 1.5+: os objetos das páginas podem estar comprimidos dentro de object streams.
+            paginas += len(RE_PAGINA_PDF.findall(conteudo))
+            continue
+        if tamanho >= LIMITE_TEXTO_IMPRESSAO:
+            continue
+        for bloco in RE_BLOCO_TEXTO_PDF.findall(conteudo):
+            for literal, hexadecimal in RE_STRING_PDF.findall(bloco):
+                texto = _decodificar_string_pdf(hexadecimal, True) if hexadecimal else _decodificar_string_pdf(literal)
+                textos.append(texto)
+                tamanho += len(texto)
+    info["paginas"] = paginas or None
+
+    referencias = RE_INFO_PDF.findall(dados)
+    if referencias:
+        numero, geracao = referencias[-1]
+        objetos = list(re.finditer(rb"(?<!\d)" + numero + rb"\s+" + geracao + rb"\s+obj\b", dados))
+        if objetos:
+            inicio = objetos[-1].end()
+            fim = dados.find(b"endobj", inicio)
+            titulo = RE_TITULO_PDF.search(dados[inicio:fim if fim >= 0 else inicio + 4096])
+            if titulo:
+                literal, hexadecimal = titulo.groups()
+                info["titulo"] = (_decodificar_string_pdf(hexadecimal, True) if hexadecimal is not None else _decodificar_string_pdf(literal)).strip() or None
+    return "".join(textos)
+
+
+def _metadados_pdf(caminho: str, dados, info: dict) -> None:
+    # A impressão digital sempre vem dos bytes, para ser a mesma com ou sem pypdf instalado.
+    texto = _metadados_pdf_bruto(dados, info)
+    normalizado = " ".join(texto.split()).lower()
+    info["impressao_texto"] = hashlib.sha256(normalizado.encode("utf-8")).hexdigest()[:32] if normalizado else None
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return
+    try:
+        leitor = PdfReader(caminho)
+        info["paginas"] = len(leitor.pages)
+        info["titulo"] = ((leitor.metadata.title if leitor.metadata else None) or "").strip() or info["titulo"]
     except Exception as e:
-        print(f"  [Erro] {e}")
-        return 0
-    finally:
-        if driver:
-            driver.quit()
+        info["ok"], info["erro"] = False, f"estrutura invalida ({e})"
+
+
+def verificar_pdf(caminho: str) -> dict:
+    """Confere cabeçalho, %%EOF e xref de um PDF e extrai páginas, título e uma impressão digital do texto.
+
+    Roda nos processos do VerificadorPdfs, por isso recebe e devolve só tipos simples.
+    Com pypdf instalado, ele também lê o arquivo e dá a contagem exata de páginas.
+    """
+    info = {"caminho": caminho, "ok": False, "erro": None, "versao": None, "tamanho": None, "paginas": None, "titulo": None, "impressao_texto": None}
+    try:
+        with open(caminho, "rb") as f:
+            info["tamanho"] = os.fstat(f.fileno()).st_size
+            if not info["tamanho"]:
+                info["erro"] = "arquivo vazio"
+                return info
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+                info["erro"] = _conferir_estrutura_pdf(dados, info)
+                if info["erro"] is None:
+                    info["ok"] = True
+                    _metadados_pdf(caminho, dados, info)
+    except (OSError, ValueError) as e:
+        info["erro"] = str(e)
+    return info
+
+
+class IndicePdfs:
+    """Índice (SQLite) de todos os PDFs baixados, com o resultado da verificação de cada um."""
+
+    def __init__(self, caminho: str = ARQUIVO_INDICE_PDFS):
+        import sqlite3
+
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+        self._conexao.row_factory = sqlite3.Row
+        with self._conexao:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS pdfs ("
+                " caminho TEXT PRIMARY KEY, url TEXT, origem TEXT, tamanho INTEGER, sha256 TEXT,"
+                " ok INTEGER, erro TEXT, versao TEXT, paginas INTEGER, titulo TEXT, impressao_texto TEXT,"
+                " verificado_em TEXT)"
+            )
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS pdfs_impressao ON pdfs (impressao_texto)")
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS pdfs_sha256 ON pdfs (sha256)")
+
+    def registrar(self, info: dict, url: str | None = None, origem: str | None = None, sha256: str | None = None) -> None:
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO pdfs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    info["caminho"], url, origem, info["tamanho"], sha256, int(info["ok"]), info["erro"],
+                    info["versao"], info["paginas"], info["titulo"], info["impressao_texto"],
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                ),
+            )
+
+    def buscar(self, termo: str = "", apenas_quebrados: bool = False, limite: int = 100) -> list[dict]:
+        """Cada palavra do termo precisa aparecer no título, no caminho ou na URL (ou ser o hash/impressão)."""
+        condicoes, parametros = [], []
+        for palavra in termo.split():
+            condicoes.append("(titulo LIKE ? OR caminho LIKE ? OR url LIKE ? OR impressao_texto = ? OR sha256 = ?)")
+            parametros += [f"%{palavra}%"] * 3 + [palavra.lower()] * 2
+        if apenas_quebrados:
+            condicoes.append("ok = 0")
+        sql = "SELECT * FROM pdfs" + (" WHERE " + " AND ".join(condicoes) if condicoes else "") + " ORDER BY caminho LIMIT ?"
+        with self._lock:
+            return [dict(linha) for linha in self._conexao.execute(sql, (*parametros, limite))]
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._conexao.close()
+
+
+class VerificadorPdfs:
+    """Confere os PDFs baixados num pool de processos, fora das threads de download, e guarda tudo no índice."""
+
+    def __init__(self, caminho_indice: str = ARQUIVO_INDICE_PDFS, processos: int | None = None):
+        self.ativo = True
+        self.caminho_indice = caminho_indice
+        self.processos = processos or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self._executor: ProcessPoolExecutor | None = None
+        self._indice: IndicePdfs | None = None
+        self._lock = threading.Lock()
+
+    def configurar(self, ativo: bool = True, caminho_indice: str | None = None) -> None:
+        with self._lock:
+            self.ativo = ativo
+            if caminho_indice and caminho_indice != self.caminho_indice:
+                self.caminho_indice = caminho_indice
+                if self._indice:
+                    self._indice.fechar()
+                    self._indice = None
+
+    def indice(self) -> IndicePdfs:
+        with self._lock:
+            if self._indice is None:
+                self._indice = IndicePdfs(self.caminho_indice)
+            return self._indice
+
+    def enviar(self, caminho: str, url: str | None = None, origem: str | None = None, sha256: str | None = None) -> Future | None:
+        """Agenda a verificação; o futuro devolve o dict de verificar_pdf, já registrado no índice."""
+        with self._lock:
+            if not self.ativo:
+                return None
+            try:
+                if self._executor is None:
+                    import multiprocessing
+
+                    # spawn: o processo principal tem threads de download e navegador, e fork com threads não é seguro.
+                    self._executor = ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context("spawn"))
+                futuro = self._executor.submit(verificar_pdf, os.path.abspath(caminho))
+            except (OSError, RuntimeError, NotImplementedError) as e:
+                # Sem processos (sandbox, pool quebrado): o download continua valendo, só não é verificado.
+                print(f"  [Aviso] Verificacao de PDFs desativada: {e}")
+                self.ativo = False
+                return None
+        futuro.add_done_callback(lambda f: self._registrar(f, url, origem, sha256))
+        return futuro
+
+    def _registrar(self, futuro: Future, url: str | None, origem: str | None, sha256: str | None) -> None:
+        if futuro.cancelled() or futuro.exception():
+            return
+        try:
+            self.indice().registrar(futuro.result(), url, origem, sha256)
+        except Exception as e:
+            print(f"  [Aviso] Nao foi possivel atualizar o indice de PDFs: {e}")
+
+    def fechar(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+        with self._lock:
+            if self._indice:
+                self._indice.fechar()
+                self._indice = None
+
+
+VERIFICADOR = VerificadorPdfs()
+
+
+def _descartar_quebrado(pasta: str, registro: dict, pasta_blobs: str | None = None) -> None:
+    """Apaga um PDF com defeito (e a cópia no armazém) para o próximo download começar do zero."""
+    _remover(os.path.join(pasta, registro["arquivo"]))
+    if pasta_blobs and registro.get("sha256"):
+        abrir_armazem(pasta_blobs).descartar(registro["sha256"])
+
+
+def _enviar_verificacao(pasta: str, url: str, origem: str | None, arquivo: str | None = None) -> tuple[dict, Future] | None:
+    """Manda o PDF recém-baixado para o VERIFICADOR; devolve o registro do manifesto e o Future do resultado."""
+    registro = abrir_manifesto(pasta).procurar(url, arquivo)
+    futuro = VERIFICADOR.enviar(os.path.join(pasta, registro["arquivo"]), url, origem, registro.get("sha256")) if registro else None
+    return (registro, futuro) if futuro else None
+
+
+def _tratar_verificacao(info: dict, pasta: str, registro: dict, pasta_blobs: str | None, repetir: bool, log: Callable[[str], None]) -> bool:
+    """True se o PDF tinha defeito e foi apagado para ser baixado de novo (só uma vez por arquivo)."""
+    if info["ok"]:
+        return False
+    if not repetir:
+        log(f"  [Aviso] {registro['arquivo']} continua com defeito: {info['erro']}")
+        return False
+    log(f"  [Verificacao] {registro['arquivo']}: {info['erro']}; baixando de novo")
+    _descartar_quebrado(pasta, registro, pasta_blobs)
+    return True
 
 
 def nome_seguro(url: str, indice: int = 0) -> str:
@@ -419,55 +2023,656 @@ def nome_seguro(url: str, indice: int = 0) -> str:
     return nome[:200]
 
 
-def baixar_pdf(url: str, pasta: str = "pdfs", sessao: requests.Session | None = None, nome_sugerido: str | None = None, max_tentativas: int = 3) -> bool:
-    import time
-    os.makedirs(pasta, exist_ok=True)
+def _nome_arquivo(url: str, nome_sugerido: str | None = None) -> str:
     nome = (re.sub(r'[<>:"/\\|?*]', "_", nome_sugerido) if nome_sugerido else nome_seguro(url))
     if nome and not nome.lower().endswith(".pdf"):
         nome += ".pdf"
-    caminho = os.path.join(pasta, nome)
+    return nome
+
 
+def _nome_livre(pasta: str, nome: str, reservados: set[str] | None = None) -> str:
+    reservados = reservados or set()
+    caminho = os.path.join(pasta, nome)
     base, ext = os.path.splitext(nome)
     contador = 1
-    while os.path.exists(caminho):
+    while os.path.exists(caminho) or caminho in reservados:
         nome = f"{base}_{contador}{ext}"
         caminho = os.path.join(pasta, nome)
         contador += 1
+    return nome
 
-    sessao = sessao or requests.Session()
-    sessao.headers.update(HEADERS)
 
-    for tentativa in range(1, max_tentativas + 1):
+def _espera_backoff(tentativa: int) -> float:
+    espera = min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** (tentativa - 1))
+    return espera / 2 + random.uniform(0, espera / 2)
+
+
+def _validador_resposta(response: requests.Response) -> str | None:
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _inicio_content_range(response: requests.Response) -> int | None:
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def _ler_meta_parcial(parcial: str, url: str) -> str | None:
+    try:
+        with open(parcial + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Pré-alocado e nunca aparado: o tamanho do .part não diz quanto foi baixado.
+    if meta.get("prealocado"):
+        return None
+    return meta.get("validador") if meta.get("url") == url else None
+
+
+def _gravar_meta_parcial(parcial: str, url: str, validador: str | None, prealocado: bool = False) -> None:
+    try:
+        with open(parcial + ".json", "w", encoding="utf-8") as f:
+            json.dump({"url": url, "validador": validador, "prealocado": prealocado}, f)
+    except OSError:
+        pass
+
+
+def _tamanho_corpo(response) -> int | None:
+    # Com Content-Encoding o Content-Length é do corpo comprimido, não do que vai para o disco.
+    if response.headers.get("Content-Encoding", "identity").lower() not in ("identity", ""):
+        return None
+    tamanho = response.headers.get("Content-Length", "")
+    return int(tamanho) if tamanho.isdigit() else None
+
+
+class _GravadorParcial:
+    """Escreve o .part de um download: pré-aloca o espaço, faz fsync em lotes e confere o tamanho no fim."""
+
+    def __init__(self, parcial: str, url: str, validador: str | None, inicio: int = 0, esperado: int | None = None, fsync_a_cada: int = 0):
+        self.parcial = parcial
+        self.url = url
+        self.validador = validador
+        self.inicio = inicio
+        self.esperado = esperado
+        self.fsync_a_cada = fsync_a_cada
+        self.escritos = 0
+        self.prealocado = False
+        self._desde_fsync = 0
+        self._arquivo = None
+
+    def __enter__(self) -> "_GravadorParcial":
+        self._arquivo = open(self.parcial, "r+b" if self.inicio else "wb")
+        self._arquivo.seek(self.inicio)
+        self._arquivo.truncate()
+        if self.esperado and hasattr(os, "posix_fallocate"):
+            _gravar_meta_parcial(self.parcial, self.url, self.validador, prealocado=True)
+            try:
+                os.posix_fallocate(self._arquivo.fileno(), self.inicio, self.esperado)
+                self.prealocado = True
+            except OSError:
+                pass
+        if not self.prealocado:
+            _gravar_meta_parcial(self.parcial, self.url, self.validador)
+        return self
+
+    def escrever(self, bloco: bytes) -> None:
+        self._arquivo.write(bloco)
+        self.escritos += len(bloco)
+        METRICAS.somar_bytes(len(bloco))
+        if self.fsync_a_cada:
+            self._desde_fsync += len(bloco)
+            if self._desde_fsync >= self.fsync_a_cada:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+                self._desde_fsync = 0
+
+    def __exit__(self, tipo, *_) -> None:
         try:
-            response = sessao.get(url, timeout=120, stream=True)
-            response.raise_for_status()
+            if self.prealocado:
+                # Tira o espaço reservado que não chegou a ser escrito, para a retomada usar o tamanho real.
+                self._arquivo.truncate(self.inicio + self.escritos)
+            if self.fsync_a_cada and tipo is None:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+        finally:
+            self._arquivo.close()
+        if self.prealocado:
+            _gravar_meta_parcial(self.parcial, self.url, self.validador)
+
+    def falta(self) -> str | None:
+        if self.esperado is not None and self.escritos != self.esperado:
+            return f"Download incompleto: {self.escritos} de {self.esperado} bytes"
+        return None
+
+
+def _remover(*caminhos: str) -> None:
+    for caminho in caminhos:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def _resolver_destino(pasta: str, url: str, nome_sugerido: str | None = None, reservados: set[str] | None = None, nome_preferido: str | None = None) -> tuple[str, dict | None]:
+    """Nome do arquivo de destino e o registro do manifesto, se já foi baixado.
+
+    nome_sugerido (ex.: Aula_01.pdf) identifica o arquivo mesmo se a URL mudar entre execuções.
+    nome_preferido (ex.: o do Content-Disposition) só vale se estiver livre: dois links
+    diferentes podem mandar o mesmo nome, e um não pode sobrescrever o outro.
+    """
+    nome = _nome_arquivo(url, nome_sugerido or nome_preferido)
+    registro = abrir_manifesto(pasta).procurar(url, nome if nome_sugerido else None)
+    if registro:
+        return registro["arquivo"], registro
+    return _nome_livre(pasta, nome, reservados), None
+
+
+def _nome_content_disposition(valor: str | None) -> str | None:
+    if not valor:
+        return None
+    match = re.search(r"filename\*\s*=\s*([\w-]*)'[^']*'([^;]+)", valor, re.IGNORECASE)
+    if match:
+        nome = unquote(match.group(2).strip().strip('"'), encoding=match.group(1) or "utf-8", errors="replace")
+    else:
+        match = re.search(r'filename\s*=\s*(?:"([^"]*)"|([^;]+))', valor, re.IGNORECASE)
+        if not match:
+            return None
+        nome = (match.group(1) if match.group(1) is not None else match.group(2)).strip()
+    return os.path.basename(nome.replace("\\", "/")).strip() or None
+
+
+def _tamanho_total(response: requests.Response) -> int | None:
+    match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+    if match:
+        return int(match.group(1))
+    tamanho = response.headers.get("Content-Length", "")
+    return int(tamanho) if tamanho.isdigit() and response.status_code == 200 else None
+
+
+def _nova_sondagem(url: str) -> dict:
+    return {"url": url, "pdf": False, "nome": None, "tamanho": None, "tipo": "", "erro": None}
+
+
+def _ler_cabecalhos_sondagem(info: dict, response) -> bool:
+    """Preenche tipo, nome e tamanho a partir da resposta (requests ou httpx); False se for erro HTTP."""
+    if response.status_code >= 400:
+        info["erro"] = f"HTTP {response.status_code}"
+        return False
+    info["tipo"] = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    info["nome"] = _nome_content_disposition(response.headers.get("Content-Disposition"))
+    info["tamanho"] = _tamanho_total(response)
+    return True
 
-            with open(caminho, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
 
-            print(f"  [OK] Baixado: {nome}")
+def _concluir_sondagem(info: dict, inicio: bytes) -> dict:
+    # A especificação permite lixo antes do cabeçalho, desde que dentro do primeiro KB.
+    info["pdf"] = b"%PDF-" in inicio[:BYTES_SONDAGEM] or (not inicio and info["tipo"] == "application/pdf")
+    return info
+
+
+def _reservar_nome(pasta: str, url: str, nome_sugerido: str | None, reservados: set[str], nome_preferido: str | None = None) -> str:
+    nome, _ = _resolver_destino(pasta, url, nome_sugerido, reservados, nome_preferido)
+    reservados.add(os.path.join(pasta, nome))
+    return nome
+
+
+def _nome_sondado(pasta: str, url: str, info: dict, reservados: set[str], log: Callable[[str], None]) -> str | None:
+    """Depois da sondagem: o nome reservado para o download, ou None (com aviso) se não for PDF."""
+    if not info["pdf"]:
+        log(f"  [Ignorado] Nao e PDF ({info['erro'] or info['tipo'] or 'tipo desconhecido'}): {url}")
+        return None
+    # O nome do servidor só substitui os genéricos (documento_N.pdf), e só se estiver livre.
+    nome_servidor = info["nome"] if nome_seguro(url).startswith("documento_") else None
+    return _reservar_nome(pasta, url, None, reservados, nome_servidor)
+
+
+@_medido("sondar_pdf")
+def sondar_pdf(url: str, sessao: requests.Session | None = None) -> dict:
+    """Lê só o começo da resposta (Range) para saber se é mesmo um PDF, o nome e o tamanho."""
+    sessao = sessao or sessao_compartilhada()
+    info = _nova_sondagem(url)
+    try:
+        response = sessao.get(url, timeout=30, stream=True, headers={"Range": f"bytes=0-{BYTES_SONDAGEM - 1}"})
+    except requests.RequestException as e:
+        info["erro"] = str(e)
+        return info
+    inicio = b""
+    with response:
+        if not _ler_cabecalhos_sondagem(info, response):
+            return info
+        try:
+            # Sem suporte a Range o servidor manda o arquivo inteiro; paramos no primeiro bloco.
+            for bloco in response.iter_content(chunk_size=BYTES_SONDAGEM):
+                inicio += bloco
+                if len(inicio) >= BYTES_SONDAGEM:
+                    break
+        except requests.RequestException as e:
+            info["erro"] = str(e)
+    return _concluir_sondagem(info, inicio)
+
+
+class _Download:
+    """A parte de um download que não depende do cliente HTTP (requests ou httpx).
+
+    baixar_pdf e _baixar_pdf_async só fazem a requisição e leem o corpo; cabeçalhos,
+    decisões sobre a resposta, .part, manifesto, armazém e mensagens ficam aqui.
+    """
+
+    def __init__(self, url: str, pasta: str, nome_sugerido: str | None, log: Callable[[str], None], origem: str | None, pasta_blobs: str | None):
+        os.makedirs(pasta, exist_ok=True)
+        self.url = url
+        self.log = log
+        self.origem = origem
+        self.manifesto = abrir_manifesto(pasta)
+        self.armazem = abrir_armazem(pasta_blobs) if pasta_blobs else None
+        self.nome, self.registro = _resolver_destino(pasta, url, nome_sugerido)
+        self.caminho = os.path.join(pasta, self.nome)
+        self.parcial = self.caminho + ".part"
+        self.ja_baixado = 0
+        self.retomando = False
+        self.etag = self.last_modified = None
+        # Um .part deixado por uma execução anterior só é retomado se soubermos o
+        # ETag/Last-Modified dele; sem validador não há como garantir que é o mesmo arquivo.
+        self.validador = _ler_meta_parcial(self.parcial, url)
+
+    def pular(self, pular_conhecidos: bool) -> bool:
+        if self.registro and pular_conhecidos:
+            self.log(f"  [OK] Ja baixado: {self.nome}")
+            return True
+        if self.validador is None:
+            _remover(self.parcial, self.parcial + ".json")
+        return False
+
+    def cabecalhos(self) -> dict:
+        self.ja_baixado = os.path.getsize(self.parcial) if os.path.exists(self.parcial) else 0
+        cabecalhos = {}
+        if self.ja_baixado and self.validador:
+            cabecalhos["Range"] = f"bytes={self.ja_baixado}-"
+            cabecalhos["If-Range"] = self.validador
+        elif self.registro:
+            if self.registro.get("etag"):
+                cabecalhos["If-None-Match"] = self.registro["etag"]
+            if self.registro.get("last_modified"):
+                cabecalhos["If-Modified-Since"] = self.registro["last_modified"]
+        return cabecalhos
+
+    def conferir_status(self, status: int) -> bool | None:
+        """Antes do raise_for_status: True se nada mudou (304), False se o trecho salvo não serve mais (416)."""
+        if status == 416:
+            # O trecho salvo não bate com o arquivo no servidor: recomeça do zero.
+            _remover(self.parcial, self.parcial + ".json")
+            return False
+        if status == 304 and self.registro:
+            self.log(f"  [OK] Sem alteracoes: {self.nome}")
+            return True
+        return None
+
+    def comecar(self, response) -> bool:
+        """Lê os cabeçalhos da resposta; True se o conteúdo já estava no armazém e só foi ligado."""
+        self.retomando = response.status_code == 206 and _inicio_content_range(response) == self.ja_baixado
+        if not self.retomando:
+            self.ja_baixado = 0
+        self.validador = _validador_resposta(response)
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+
+        sha_existente = self.armazem.procurar(response.headers.get("Content-Length"), self.etag) if self.armazem and not self.retomando else None
+        if not sha_existente:
+            return False
+        self.armazem.ligar(sha_existente, self.caminho)
+        _remover(self.parcial, self.parcial + ".json")
+        self.manifesto.registrar(self.url, self.nome, os.path.getsize(self.caminho), self.etag, self.last_modified, sha_existente, self.origem)
+        self.log(f"  [OK] Reaproveitado: {self.nome} (mesmo conteudo ja baixado)")
+        return True
+
+    def hash_parcial(self):
+        hash_conteudo = hashlib.sha256()
+        if self.retomando:
+            with open(self.parcial, "rb") as f:
+                for bloco in iter(lambda: f.read(1 << 20), b""):
+                    hash_conteudo.update(bloco)
+        return hash_conteudo
+
+    def gravador(self, response, fsync_a_cada: int) -> _GravadorParcial:
+        return _GravadorParcial(self.parcial, self.url, self.validador, self.ja_baixado, _tamanho_corpo(response), fsync_a_cada)
+
+    @staticmethod
+    def escrever(gravador: _GravadorParcial, hash_conteudo, bloco: bytes) -> None:
+        gravador.escrever(bloco)
+        hash_conteudo.update(bloco)
+
+    def terminar(self, gravador: _GravadorParcial, hash_conteudo, duracao: float) -> None:
+        duracao = max(duracao, 1e-6)
+        taxa = f"{_formatar_bytes(gravador.escritos)}, {_formatar_bytes(gravador.escritos / duracao)}/s"
+        os.replace(self.parcial, self.caminho)
+        _remover(self.parcial + ".json")
+        sha256 = hash_conteudo.hexdigest()
+        self.manifesto.registrar(self.url, self.nome, os.path.getsize(self.caminho), self.etag, self.last_modified, sha256, self.origem)
+        if self.armazem and self.armazem.incorporar(self.caminho, sha256, self.etag):
+            self.log(f"  [OK] Baixado: {self.nome} ({taxa}; conteudo repetido, ligado a copia existente)")
+        elif self.retomando:
+            self.log(f"  [OK] Baixado: {self.nome} ({taxa}; retomado a partir de {self.ja_baixado} bytes)")
+        else:
+            self.log(f"  [OK] Baixado: {self.nome} ({taxa})")
+
+    def falhou(self, tentativa: int, max_tentativas: int, erro: Exception) -> float | None:
+        """Depois de um erro: quantos segundos esperar antes da próxima tentativa, ou None se acabaram."""
+        if not self.validador:
+            _remover(self.parcial, self.parcial + ".json")
+        if tentativa < max_tentativas:
+            espera = _espera_backoff(tentativa)
+            self.log(f"  [Tentativa {tentativa}/{max_tentativas}] Falhou, tentando novamente em {espera:.1f}s...")
+            return espera
+        self.log(f"  [ERRO] Ao baixar apos {max_tentativas} tentativas: {erro}")
+        return None
+
+
+@_medido("baixar_pdf")
+def baixar_pdf(url: str, pasta: str = "pdfs", sessao: requests.Session | None = None, nome_sugerido: str | None = None, max_tentativas: int = 3, log: Callable[[str], None] = print, pular_conhecidos: bool = False, origem: str | None = None, pasta_blobs: str | None = None, tamanho_bloco: int = TAMANHO_BLOCO_DOWNLOAD, fsync_a_cada: int = 0) -> bool:
+    download = _Download(url, pasta, nome_sugerido, log, origem, pasta_blobs)
+    if download.pular(pular_conhecidos):
+        return True
+    sessao = sessao or sessao_compartilhada()
+
+    for tentativa in range(1, max_tentativas + 1):
+        try:
+            response = sessao.get(url, timeout=120, stream=True, headers=download.cabecalhos())
+            with response:
+                decisao = download.conferir_status(response.status_code)
+                if decisao is False:
+                    raise requests.HTTPError("416 Range Not Satisfiable", response=response)
+                if decisao:
+                    return True
+                response.raise_for_status()
+                if download.comecar(response):
+                    return True
+
+                hash_conteudo = download.hash_parcial()
+                inicio_transferencia = time.monotonic()
+                with download.gravador(response, fsync_a_cada) as gravador:
+                    for chunk in response.iter_content(chunk_size=tamanho_bloco):
+                        download.escrever(gravador, hash_conteudo, chunk)
+            if gravador.falta():
+                raise requests.RequestException(gravador.falta())
+            download.terminar(gravador, hash_conteudo, time.monotonic() - inicio_transferencia)
             return True
         except requests.RequestException as e:
-            if os.path.exists(caminho):
-                try:
-                    os.remove(caminho)
-                except Exception:
-                    pass
-            if tentativa < max_tentativas:
-                print(f"  [Tentativa {tentativa}/{max_tentativas}] Falhou, tentando novamente em 5s...")
-                time.sleep(5)
-            else:
-                print(f"  [ERRO] Ao baixar apos {max_tentativas} tentativas: {e}")
+            espera = download.falhou(tentativa, max_tentativas, e)
+            if espera is None:
                 return False
+            time.sleep(espera)
     return False
 
 
-def baixar_pdfs_site(url: str, pasta: str = "pdfs", sessao: requests.Session | None = None, usar_selenium: bool = False) -> int:
+def _segundos_retry_after(valor: str | None) -> float | None:
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        segundos = float(valor)
+    else:
+        try:
+            segundos = (parsedate_to_datetime(valor) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(segundos, 0.0), RETRY_AFTER_MAXIMO)
+
+
+class LimitadorHost:
+    """Token bucket por host que desacelera sozinho quando o servidor responde 429/503.
+
+    Com taxa 0 não há limite até o primeiro 429/503; depois disso o host passa a ter
+    uma taxa própria, que cai pela metade a cada reclamação e volta a subir aos poucos.
+    """
+
+    def __init__(self, taxa: float = 0.0, rajada: int = RAJADA_HOST):
+        self.taxa = taxa
+        self.rajada = rajada
+        self._baldes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def configurar(self, taxa: float, rajada: int | None = None) -> None:
+        with self._lock:
+            self.taxa = max(0.0, taxa)
+            self.rajada = rajada or self.rajada
+            self._baldes.clear()
+
+    def _balde(self, host: str) -> dict:
+        if host not in self._baldes:
+            self._baldes[host] = {"taxa": self.taxa, "fichas": float(self.rajada), "atualizado": time.monotonic(), "liberado_em": 0.0}
+        return self._baldes[host]
+
+    def _reservar(self, host: str) -> float:
+        """Consome uma ficha e devolve 0, ou devolve quantos segundos esperar antes de tentar de novo."""
+        with self._lock:
+            balde = self._balde(host)
+            agora = time.monotonic()
+            espera = balde["liberado_em"] - agora
+            if espera > 0:
+                return espera
+            if balde["taxa"] <= 0:
+                return 0.0
+            balde["fichas"] = min(self.rajada, balde["fichas"] + (agora - balde["atualizado"]) * balde["taxa"])
+            balde["atualizado"] = agora
+            if balde["fichas"] >= 1:
+                balde["fichas"] -= 1
+                return 0.0
+            return (1 - balde["fichas"]) / balde["taxa"]
+
+    def aguardar(self, url: str) -> None:
+        host = urlparse(url).netloc
+        while (espera := self._reservar(host)) > 0:
+            time.sleep(espera)
+
+    async def aguardar_async(self, url: str) -> None:
+        import asyncio
+
+        host = urlparse(url).netloc
+        while (espera := self._reservar(host)) > 0:
+            await asyncio.sleep(espera)
+
+    def registrar(self, url: str, status: int, retry_after: str | None = None) -> None:
+        host = urlparse(url).netloc
+        with self._lock:
+            balde = self._balde(host)
+            if status in (429, 503):
+                balde["taxa"] = max(TAXA_MINIMA_HOST, (balde["taxa"] or TAXA_APOS_LIMITE) / 2)
+                balde["fichas"] = 0.0
+                balde["atualizado"] = time.monotonic()
+                pausa = _segundos_retry_after(retry_after)
+                if pausa:
+                    balde["liberado_em"] = max(balde["liberado_em"], time.monotonic() + pausa)
+            elif status < 400 and balde["taxa"] and (not self.taxa or balde["taxa"] < self.taxa):
+                balde["taxa"] *= 1.05
+                if self.taxa:
+                    balde["taxa"] = min(balde["taxa"], self.taxa)
+                elif balde["taxa"] >= TAXA_APOS_LIMITE * 8:
+                    balde["taxa"] = 0.0
+
+
+LIMITADOR = LimitadorHost()
+
+
+class AdaptadorLimitado(HTTPAdapter):
+    def send(self, request, **kwargs):
+        METRICAS.marcar_primeira_requisicao()
+        for tentativa in range(1, TENTATIVAS_LIMITE + 1):
+            LIMITADOR.aguardar(request.url)
+            response = super().send(request, **kwargs)
+            LIMITADOR.registrar(request.url, response.status_code, response.headers.get("Retry-After"))
+            if response.status_code not in (429, 503) or tentativa == TENTATIVAS_LIMITE:
+                return response
+            response.close()
+        return response
+
+
+def _preparar_sessao(sessao: requests.Session | None, tamanho_pool: int) -> requests.Session:
+    sessao = sessao or requests.Session()
+    sessao.headers.update(HEADERS)
+    atual = sessao.get_adapter("https://")
+    if not isinstance(atual, AdaptadorLimitado) or atual._pool_maxsize < tamanho_pool:
+        adaptador = AdaptadorLimitado(pool_connections=HOSTS_POR_SESSAO, pool_maxsize=tamanho_pool)
+        sessao.mount("https://", adaptador)
+        sessao.mount("http://", adaptador)
+    return sessao
+
+
+_SESSAO_PADRAO: requests.Session | None = None
+_SESSAO_PADRAO_LOCK = threading.Lock()
+
+
+def sessao_compartilhada() -> requests.Session:
+    global _SESSAO_PADRAO
+    with _SESSAO_PADRAO_LOCK:
+        if _SESSAO_PADRAO is None:
+            _SESSAO_PADRAO = _preparar_sessao(None, MAX_DOWNLOADS_SIMULTANEOS * 2)
+        return _SESSAO_PADRAO
+
+
+class AgendadorDownloads:
+    """Roda baixar_pdf em paralelo e imprime as mensagens na ordem de envio."""
+
+    def __init__(self, sessao: requests.Session | None = None, max_simultaneos: int = MAX_DOWNLOADS_SIMULTANEOS, max_por_host: int = MAX_DOWNLOADS_POR_HOST, **opcoes_download):
+        self.opcoes_download = opcoes_download
+        self.max_simultaneos = max(1, max_simultaneos)
+        self.max_por_host = max(1, max_por_host)
+        self.sessao = _preparar_sessao(sessao or sessao_compartilhada(), self.max_simultaneos)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_simultaneos, thread_name_prefix="download")
+        self._semaforos: dict[str, threading.BoundedSemaphore] = {}
+        self._reservados: set[str] = set()
+        self._pendentes: list[tuple[Future, list[str], bool]] = []
+        self._resultados: list[bool] = []
+        self._lock = threading.Lock()
+        self._verificacoes = 0
+        self._sem_verificacoes = threading.Condition(self._lock)
+        self._repetidos: set[str] = set()
+
+    def enviar(self, url: str, pasta: str = "pdfs", nome_sugerido: str | None = None, origem: str | None = None, sondar: bool = False, contar: bool = True, ao_terminar: Callable[[bool], None] | None = None) -> None:
+        os.makedirs(pasta, exist_ok=True)
+        host = urlparse(url).netloc
+        with self._lock:
+            # Com sondagem o nome só é decidido depois, pois o servidor pode informar um melhor.
+            nome = None
+            if not sondar or nome_sugerido or abrir_manifesto(pasta).procurar(url):
+                nome = _reservar_nome(pasta, url, nome_sugerido, self._reservados)
+            semaforo = self._semaforos.setdefault(host, threading.BoundedSemaphore(self.max_por_host))
+            linhas: list[str] = []
+            futuro = self._executor.submit(self._executar, url, pasta, nome, origem, semaforo, linhas)
+            self._pendentes.append((futuro, linhas, contar))
+        if ao_terminar:
+            futuro.add_done_callback(lambda f: ao_terminar(not f.cancelled() and f.exception() is None and f.result()))
+        futuro.add_done_callback(lambda _: self._descarregar())
+
+    def _executar(self, url: str, pasta: str, nome: str | None, origem: str | None, semaforo: threading.BoundedSemaphore, linhas: list[str]) -> bool:
+        with semaforo:
+            if nome is None:
+                info = sondar_pdf(url, self.sessao)
+                with self._lock:
+                    nome = _nome_sondado(pasta, url, info, self._reservados, linhas.append)
+                if nome is None:
+                    return False
+            ok = baixar_pdf(url, pasta, self.sessao, nome_sugerido=nome, log=linhas.append, origem=origem, **self.opcoes_download)
+        if ok:
+            self._verificar(url, pasta, origem, nome)
+        return ok
+
+    def _verificar(self, url: str, pasta: str, origem: str | None, arquivo: str) -> None:
+        enviado = _enviar_verificacao(pasta, url, origem, arquivo)
+        if enviado is None:
+            return
+        registro, futuro = enviado
+        # Contado antes de o download terminar, para concluir() não encerrar com uma verificação em andamento.
+        with self._lock:
+            self._verificacoes += 1
+        futuro.add_done_callback(lambda f: self._verificado(f, url, pasta, origem, registro))
+
+    def _verificado(self, futuro: Future, url: str, pasta: str, origem: str | None, registro: dict) -> None:
+        try:
+            if futuro.cancelled() or futuro.exception() or futuro.result()["ok"]:
+                return
+            chave = os.path.join(pasta, registro["arquivo"])
+            with self._lock:
+                repetir = chave not in self._repetidos
+                self._repetidos.add(chave)
+            if not _tratar_verificacao(futuro.result(), pasta, registro, self.opcoes_download.get("pasta_blobs"), repetir, print):
+                return
+            with self._lock:
+                self._reservados.discard(os.path.join(pasta, registro["arquivo"]))
+            try:
+                # O primeiro download já entrou na contagem; a repetição não conta de novo.
+                self.enviar(url, pasta, registro["arquivo"], origem, contar=False)
+            except RuntimeError:
+                # O agendador foi encerrado antes (erro ou Ctrl+C); o arquivo é baixado na próxima execução.
+                pass
+        finally:
+            with self._lock:
+                self._verificacoes -= 1
+                self._sem_verificacoes.notify_all()
+
+    def _descarregar(self) -> None:
+        with self._lock:
+            while len(self._resultados) < len(self._pendentes):
+                futuro, linhas, _ = self._pendentes[len(self._resultados)]
+                if not futuro.done():
+                    break
+                try:
+                    ok = futuro.result()
+                except Exception as e:
+                    linhas.append(f"  [ERRO] {e}")
+                    ok = False
+                for linha in linhas:
+                    print(linha)
+                self._resultados.append(ok)
+
+    def concluir(self) -> list[bool]:
+        # Uma verificação pode devolver um arquivo para a fila; só encerra quando nada mais está em andamento.
+        while True:
+            with self._lock:
+                futuros = [futuro for futuro, _, _ in self._pendentes if not futuro.done()]
+                if not futuros:
+                    if not self._verificacoes:
+                        break
+                    self._sem_verificacoes.wait()
+                    continue
+            wait(futuros)
+        self._executor.shutdown(wait=True)
+        self._descarregar()
+        return [ok for ok, (_, _, contar) in zip(self._resultados, self._pendentes) if contar]
+
+    def __enter__(self) -> "AgendadorDownloads":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=exc[0] is not None)
+        self._descarregar()
+
+
+def baixar_pdfs_concorrente(links: list[str], pasta: str = "pdfs", sessao: requests.Session | None = None, max_simultaneos: int = MAX_DOWNLOADS_SIMULTANEOS, max_por_host: int = MAX_DOWNLOADS_POR_HOST, sondar: bool = False, **opcoes_download) -> list[bool]:
+    with AgendadorDownloads(sessao, max_simultaneos, max_por_host, **opcoes_download) as agendador:
+        for link in links:
+            agendador.enviar(link, pasta, sondar=sondar)
+        return agendador.concluir()
+
+
+def baixar_pdfs_site(url: str, pasta: str = "pdfs", sessao: requests.Session | None = None, usar_selenium: bool = False, max_simultaneos: int = MAX_DOWNLOADS_SIMULTANEOS, max_por_host: int = MAX_DOWNLOADS_POR_HOST, tempo_maximo_espera: float = TEMPO_MAXIMO_ESPERA, incremental: bool = False, sondar: bool = True, perfil: str | None = PASTA_PERFIL_NAVEGADOR, pool: "PoolNavegadores | None" = None, **opcoes_download) -> int:
     print(f"\nAnalisando: {url}")
 
+    if incremental and not usar_selenium:
+        with AgendadorDownloads(sessao, max_simultaneos, max_por_host, **opcoes_download) as agendador:
+            encontrados = 0
+            for link in encontrar_pdfs_incremental(url, agendador.sessao):
+                agendador.enviar(link, pasta, sondar=sondar)
+                encontrados += 1
+            if not encontrados:
+                print("  Nenhum PDF encontrado.")
+                return 0
+            print(f"  Encontrados {encontrados} link(s) de PDF")
+            return sum(agendador.concluir())
+
     if usar_selenium:
-        pdfs, sessao, cliques = encontrar_pdfs_selenium(url, pasta)
+        pdfs, sessao, cliques = encontrar_pdfs_selenium(url, pasta, tempo_maximo_espera=tempo_maximo_espera, perfil=perfil, pool=pool)
     else:
         pdfs = encontrar_pdfs(url, sessao)
         cliques = 0
@@ -479,13 +2684,513 @@ def baixar_pdfs_site(url: str, pasta: str = "pdfs", sessao: requests.Session | N
     baixados = cliques
     if pdfs:
         print(f"  Encontrados {len(pdfs)} link(s) de PDF")
-        for link in pdfs:
-            if baixar_pdf(link, pasta, sessao):
-                baixados += 1
+        baixados += sum(baixar_pdfs_concorrente(pdfs, pasta, sessao, max_simultaneos, max_por_host, sondar=sondar, **opcoes_download))
 
     return baixados
 
 
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("Para a API assíncrona, instale: pip install httpx[http2]") from None
+    return httpx
+
+
+def carregar_cliente_async(cookies_path: str | None = None, max_conexoes: int = MAX_DOWNLOADS_SIMULTANEOS * 2):
+    """httpx.AsyncClient com pool de conexões, HTTP/2 (se o pacote h2 estiver instalado) e os cookies de cookies.txt."""
+    httpx = _httpx()
+    jar = None
+    caminho = cookies_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_COOKIES)
+    if os.path.exists(caminho):
+        try:
+            jar = MozillaCookieJar(caminho)
+            jar.load(ignore_discard=True)
+        except Exception as e:
+            print(f"  [Aviso] Não foi possível carregar cookies.txt: {e}\n")
+            jar = None
+    return httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        headers=HEADERS,
+        cookies=jar,
+        follow_redirects=True,
+        timeout=httpx.Timeout(120.0, connect=15.0),
+        limits=httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes),
+    )
+
+
+_CLIENTES_ASYNC: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def cliente_async_compartilhado():
+    import asyncio
+
+    # Um AsyncClient só pode ser usado no event loop em que foi criado.
+    loop = asyncio.get_running_loop()
+    cliente = _CLIENTES_ASYNC.get(loop)
+    if cliente is None or cliente.is_closed:
+        cliente = _CLIENTES_ASYNC[loop] = carregar_cliente_async()
+    return cliente
+
+
+async def fechar_cliente_async() -> None:
+    import asyncio
+
+    cliente = _CLIENTES_ASYNC.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+async def _requisitar_async(cliente, url: str, cabecalhos: dict | None = None):
+    # Mesmo controle do AdaptadorLimitado: espera a vez no LIMITADOR e repete 429/503.
+    METRICAS.marcar_primeira_requisicao()
+    for tentativa in range(1, TENTATIVAS_LIMITE + 1):
+        await LIMITADOR.aguardar_async(url)
+        response = await cliente.send(cliente.build_request("GET", url, headers=cabecalhos), stream=True)
+        LIMITADOR.registrar(url, response.status_code, response.headers.get("Retry-After"))
+        if response.status_code not in (429, 503) or tentativa == TENTATIVAS_LIMITE:
+            return response
+        await response.aclose()
+    return response
+
+
+async def encontrar_pdfs_async(url: str, cliente=None, timeout: float | None = None) -> list[str]:
+    """Versão assíncrona de encontrar_pdfs. Estoura asyncio.TimeoutError se passar de timeout segundos."""
+    import asyncio
+
+    return await asyncio.wait_for(_encontrar_pdfs_async(url, cliente or cliente_async_compartilhado()), timeout)
+
+
+async def _encontrar_pdfs_async(url: str, cliente) -> list[str]:
+    import asyncio
+
+    httpx = _httpx()
+    try:
+        with METRICAS.medir("buscar_pagina"):
+            response = await _requisitar_async(cliente, url)
+            try:
+                response.raise_for_status()
+                await response.aread()
+            finally:
+                await response.aclose()
+    except httpx.HTTPError as e:
+        print(f"Erro ao acessar {url}: {e}")
+        return []
+    # A análise do HTML é CPU pura; numa thread ela não trava o event loop.
+    return await asyncio.to_thread(_extrair_pdfs_html, response.text, url)
+
+
+async def sondar_pdf_async(url: str, cliente=None, timeout: float | None = None) -> dict:
+    import asyncio
+
+    return await asyncio.wait_for(_sondar_pdf_async(url, cliente or cliente_async_compartilhado()), timeout)
+
+
+async def _sondar_pdf_async(url: str, cliente) -> dict:
+    httpx = _httpx()
+    info = _nova_sondagem(url)
+    with METRICAS.medir("sondar_pdf"):
+        try:
+            response = await _requisitar_async(cliente, url, {"Range": f"bytes=0-{BYTES_SONDAGEM - 1}"})
+        except httpx.HTTPError as e:
+            info["erro"] = str(e)
+            return info
+        inicio = b""
+        try:
+            if not _ler_cabecalhos_sondagem(info, response):
+                return info
+            async for bloco in response.aiter_bytes(BYTES_SONDAGEM):
+                inicio += bloco
+                if len(inicio) >= BYTES_SONDAGEM:
+                    break
+        except httpx.HTTPError as e:
+            info["erro"] = str(e)
+        finally:
+            await response.aclose()
+    return _concluir_sondagem(info, inicio)
+
+
+async def baixar_pdf_async(url: str, pasta: str = "pdfs", cliente=None, nome_sugerido: str | None = None, timeout: float | None = None, **opcoes_download) -> bool:
+    """Versão assíncrona de baixar_pdf, com o mesmo .part, manifesto e armazém de blobs.
+
+    Se a tarefa for cancelada (ou estourar o timeout) no meio da transferência, o .part
+    fica no disco e a próxima chamada continua de onde parou.
+    """
+    import asyncio
+
+    return await asyncio.wait_for(
+        _baixar_pdf_async(url, pasta, cliente or cliente_async_compartilhado(), nome_sugerido, **opcoes_download), timeout,
+    )
+
+
+async def _baixar_pdf_async(url: str, pasta: str, cliente, nome_sugerido: str | None = None, max_tentativas: int = 3, log: Callable[[str], None] = print, pular_conhecidos: bool = False, origem: str | None = None, pasta_blobs: str | None = None, tamanho_bloco: int = TAMANHO_BLOCO_DOWNLOAD, fsync_a_cada: int = 0) -> bool:
+    import asyncio
+
+    httpx = _httpx()
+    download = _Download(url, pasta, nome_sugerido, log, origem, pasta_blobs)
+    if download.pular(pular_conhecidos):
+        return True
+
+    with METRICAS.medir("baixar_pdf"):
+        for tentativa in range(1, max_tentativas + 1):
+            try:
+                response = await _requisitar_async(cliente, url, download.cabecalhos())
+                try:
+                    decisao = download.conferir_status(response.status_code)
+                    if decisao is False:
+                        raise httpx.HTTPStatusError("416 Range Not Satisfiable", request=response.request, response=response)
+                    if decisao:
+                        return True
+                    response.raise_for_status()
+                    if download.comecar(response):
+                        return True
+
+                    # Reler o .part e gravar no disco bloqueiam; em threads, o event loop segue com os outros downloads.
+                    hash_conteudo = await asyncio.to_thread(download.hash_parcial)
+                    inicio_transferencia = time.monotonic()
+                    with download.gravador(response, fsync_a_cada) as gravador:
+                        async for chunk in response.aiter_bytes(tamanho_bloco):
+                            await asyncio.to_thread(download.escrever, gravador, hash_conteudo, chunk)
+                    if gravador.falta():
+                        raise httpx.HTTPError(gravador.falta())
+                finally:
+                    await response.aclose()
+                await asyncio.to_thread(download.terminar, gravador, hash_conteudo, time.monotonic() - inicio_transferencia)
+                return True
+            except httpx.HTTPError as e:
+                espera = download.falhou(tentativa, max_tentativas, e)
+                if espera is None:
+                    return False
+                await asyncio.sleep(espera)
+    return False
+
+
+async def baixar_pdfs_site_async(url: str, pasta: str = "pdfs", cliente=None, max_simultaneos: int = MAX_DOWNLOADS_SIMULTANEOS, max_por_host: int = MAX_DOWNLOADS_POR_HOST, sondar: bool = True, timeout: float | None = None, **opcoes_download) -> int:
+    """Versão assíncrona de baixar_pdfs_site (sem navegador). timeout vale para a chamada inteira."""
+    import asyncio
+
+    return await asyncio.wait_for(
+        _baixar_pdfs_site_async(url, pasta, cliente or cliente_async_compartilhado(), max_simultaneos, max_por_host, sondar, opcoes_download), timeout,
+    )
+
+
+async def _verificar_async(pasta: str, url: str, arquivo: str, pasta_blobs: str | None, log: Callable[[str], None], repetir: bool = True) -> bool:
+    """Verifica o PDF recém-baixado no VERIFICADOR; True se ele tinha defeito e foi apagado para baixar de novo."""
+    import asyncio
+
+    enviado = _enviar_verificacao(pasta, url, None, arquivo)
+    if enviado is None:
+        return False
+    registro, futuro = enviado
+    try:
+        info = await asyncio.wrap_future(futuro)
+    except Exception:
+        return False
+    return _tratar_verificacao(info, pasta, registro, pasta_blobs, repetir, log)
+
+
+async def _baixar_pdfs_site_async(url: str, pasta: str, cliente, max_simultaneos: int, max_por_host: int, sondar: bool, opcoes_download: dict) -> int:
+    import asyncio
+
+    print(f"\nAnalisando: {url}")
+    pdfs = await _encontrar_pdfs_async(url, cliente)
+    if not pdfs:
+        print("  Nenhum PDF encontrado.")
+        return 0
+    print(f"  Encontrados {len(pdfs)} link(s) de PDF")
+
+    os.makedirs(pasta, exist_ok=True)
+    limite_geral = asyncio.Semaphore(max(1, max_simultaneos))
+    limites_host: dict[str, asyncio.Semaphore] = {}
+    reservados: set[str] = set()
+
+    async def _baixar(link: str, nome: str | None, linhas: list[str]) -> bool:
+        limite_host = limites_host.setdefault(urlparse(link).netloc, asyncio.Semaphore(max(1, max_por_host)))
+        async with limite_geral, limite_host:
+            if nome is None:
+                nome = _nome_sondado(pasta, link, await _sondar_pdf_async(link, cliente), reservados, linhas.append)
+                if nome is None:
+                    return False
+            ok = await _baixar_pdf_async(link, pasta, cliente, nome, log=linhas.append, **opcoes_download)
+            if ok and await _verificar_async(pasta, link, nome, opcoes_download.get("pasta_blobs"), linhas.append):
+                ok = await _baixar_pdf_async(link, pasta, cliente, nome, log=linhas.append, **opcoes_download)
+                await _verificar_async(pasta, link, nome, opcoes_download.get("pasta_blobs"), linhas.append, repetir=False)
+            return ok
+
+    tarefas, saidas = [], []
+    for link in pdfs:
+        nome = None
+        if not sondar or abrir_manifesto(pasta).procurar(link):
+            nome = _reservar_nome(pasta, link, None, reservados)
+        linhas: list[str] = []
+        saidas.append(linhas)
+        tarefas.append(_baixar(link, nome, linhas))
+
+    resultados = await asyncio.gather(*tarefas, return_exceptions=True)
+    for linhas, ok in zip(saidas, resultados):
+        if isinstance(ok, BaseException):
+            linhas.append(f"  [ERRO] {ok}")
+        for linha in linhas:
+            print(linha)
+    return sum(ok is True for ok in resultados)
+
+
+def _normalizar_url(url: str) -> str:
+    partes = urlparse(url)
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or "").lower()
+    if partes.port and (esquema, partes.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{partes.port}"
+    consulta = "&".join(sorted(
+        p for p in partes.query.split("&") if p and not p.lower().startswith(("utm_", "fbclid=", "gclid="))
+    ))
+    return f"{esquema}://{host}{partes.path or '/'}" + (f"?{consulta}" if consulta else "")
+
+
+def _mesmo_site(url: str, host_inicial: str) -> bool:
+    host = (urlparse(url).hostname or "").lower()
+    return host.removeprefix("www.") == host_inicial.removeprefix("www.")
+
+
+def _prioridade_link(href: str, texto: str, regras: RegrasLinks | None = None) -> int:
+    # Menor é melhor: botões "Baixar Livro" primeiro, depois paginação, depois o resto.
+    if (regras or regras_para(href)).e_livro(texto):
+        return 0
+    if RE_PAGINACAO_TEXTO.search(texto) or RE_PAGINACAO_URL.search(href):
+        return 1
+    return 2
+
+
+class _Robots:
+    def __init__(self, sessao: requests.Session):
+        self.sessao = sessao
+        self._parsers: dict[str, RobotFileParser | None] = {}
+        self._lock = threading.Lock()
+
+    def permite(self, url: str) -> bool:
+        partes = urlparse(url)
+        raiz = f"{partes.scheme}://{partes.netloc}"
+        with self._lock:
+            if raiz not in self._parsers:
+                self._parsers[raiz] = self._carregar(raiz)
+            parser = self._parsers[raiz]
+        return parser is None or parser.can_fetch(HEADERS["User-Agent"], url)
+
+    def _carregar(self, raiz: str) -> RobotFileParser | None:
+        try:
+            response = self.sessao.get(f"{raiz}/robots.txt", timeout=15)
+        except requests.RequestException:
+            return None
+        if response.status_code >= 400:
+            return None
+        parser = RobotFileParser()
+        parser.parse(response.text.splitlines())
+        return parser
+
+
+@_medido("buscar_pagina")
+def _buscar_pagina_rastreio(sessao: requests.Session, url: str) -> tuple[str, str | None]:
+    try:
+        response = sessao.get(url, timeout=15, stream=True)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"  [Aviso] {url}: {e}")
+        return "erro", None
+    with response:
+        tipo = response.headers.get("Content-Type", "").lower()
+        if "pdf" in tipo:
+            return "pdf", None
+        if "html" not in tipo and tipo:
+            return "outro", None
+        return "html", response.text
+
+
+def rastrear_site(url_inicial: str, pasta: str = "pdfs", sessao: requests.Session | None = None, profundidade_maxima: int = PROFUNDIDADE_RASTREIO, max_paginas: int = MAX_PAGINAS_RASTREIO, simultaneas: int = MAX_DOWNLOADS_SIMULTANEOS, respeitar_robots: bool = True, max_simultaneos: int = MAX_DOWNLOADS_SIMULTANEOS, max_por_host: int = MAX_DOWNLOADS_POR_HOST, sondar: bool = True, **opcoes_download) -> int:
+    print(f"\nRastreando: {url_inicial} (profundidade {profundidade_maxima}, ate {max_paginas} paginas)")
+    sessao = _preparar_sessao(sessao or sessao_compartilhada(), simultaneas + max_simultaneos)
+    host_inicial = (urlparse(url_inicial).hostname or "").lower()
+    robots = _Robots(sessao) if respeitar_robots else None
+
+    fronteira: list[tuple[int, int, int, str]] = []
+    vistos: set[str] = set()
+    pdfs_vistos: set[str] = set()
+    ordem = 0
+
+    def _enfileirar(url: str, profundidade: int, prioridade: int) -> None:
+        nonlocal ordem
+        chave = _normalizar_url(url)
+        # Botões "Baixar Livro" (prioridade 0) podem passar um nível do limite: quase sempre levam
+        # ao PDF ou a uma página que só tem o link dele, e sem isso seriam perdidos no último nível.
+        limite = profundidade_maxima + (1 if prioridade == 0 else 0)
+        if chave in vistos or profundidade > limite or not _mesmo_site(url, host_inicial):
+            return
+        vistos.add(chave)
+        heapq.heappush(fronteira, (prioridade, profundidade, ordem, url))
+        ordem += 1
+
+    def _enviar_pdf(link: str) -> None:
+        chave = _normalizar_url(link)
+        if chave in pdfs_vistos or (robots and not robots.permite(link)):
+            return
+        pdfs_vistos.add(chave)
+        vistos.add(chave)
+        agendador.enviar(link, pasta, sondar=sondar)
+
+    _enfileirar(url_inicial, 0, 0)
+    paginas = 0
+    with AgendadorDownloads(sessao, max_simultaneos, max_por_host, **opcoes_download) as agendador, \
+            ThreadPoolExecutor(max_workers=max(1, simultaneas), thread_name_prefix="rastreio") as leitor:
+        em_andamento: dict[Future, tuple[str, int]] = {}
+        while fronteira or em_andamento:
+            while fronteira and len(em_andamento) < simultaneas and paginas < max_paginas:
+                _, profundidade, _, url = heapq.heappop(fronteira)
+                if robots and not robots.permite(url):
+                    print(f"  [robots.txt] Ignorado: {url}")
+                    continue
+                paginas += 1
+                em_andamento[leitor.submit(_buscar_pagina_rastreio, sessao, url)] = (url, profundidade)
+            if not em_andamento:
+                break
+            prontos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                url, profundidade = em_andamento.pop(futuro)
+                tipo, html = futuro.result()
+                if tipo == "pdf":
+                    _enviar_pdf(url)
+                if tipo != "html" or not html:
+                    continue
+                regras = regras_para(url)
+                candidatos = _coletar_candidatos(html, com_links=True, regras=regras)
+                # Só o que tem cara de PDF vai direto para os downloads. Os links amplos ("/ebooks/3") e os
+                # botões "Baixar Livro" sem .pdf entram na fronteira como páginas: se forem PDF, o
+                # Content-Type da busca manda para o download; se forem HTML, são rastreados.
+                for href in candidatos["pdf"] + candidatos["data"]:
+                    _enviar_pdf(urljoin(url, href))
+                for href, texto in candidatos["links"]:
+                    if not href or href.startswith(("#", "mailto:", "tel:")) or "javascript" in href.lower():
+                        continue
+                    destino = urljoin(url, href)
+                    if regras.href_pdf.search(destino):
+                        _enviar_pdf(destino)
+                    else:
+                        _enfileirar(destino, profundidade + 1, _prioridade_link(href, texto, regras))
+
+        print(f"  {paginas} pagina(s) visitada(s), {len(pdfs_vistos)} link(s) de PDF")
+        return sum(agendador.concluir())
+
+
+MODOS_LOTE = ("curso", "site", "navegador")
+
+
+def carregar_lote(caminho: str) -> list[dict]:
+    extensao = os.path.splitext(caminho)[1].lower()
+    with open(caminho, encoding="utf-8-sig", newline="") as f:
+        if extensao == ".csv":
+            itens = list(csv.DictReader(f))
+        elif extensao in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("Para lotes em YAML, instale: pip install pyyaml")
+            itens = yaml.safe_load(f)
+        else:
+            itens = json.load(f)
+    if isinstance(itens, dict):
+        itens = itens.get("cursos", [])
+
+    trabalhos = []
+    for n, item in enumerate(itens or [], start=1):
+        if not isinstance(item, dict):
+            print(f"  [Aviso] Item {n} do lote nao tem campos (nome, url, ...), ignorado.")
+            continue
+        url = str(item.get("url") or "").strip()
+        if not url:
+            print(f"  [Aviso] Item {n} do lote sem URL, ignorado.")
+            continue
+        modo = str(item.get("modo") or "curso").strip().lower()
+        if modo not in MODOS_LOTE:
+            print(f"  [Aviso] Item {n} do lote com modo desconhecido '{modo}' (use {', '.join(MODOS_LOTE)}), ignorado.")
+            continue
+        nome = str(item.get("nome") or f"Curso {n}").strip()
+        aula = str(item.get("aula") or "").strip()
+        trabalhos.append({
+            "nome": nome,
+            "url": url,
+            "pasta": str(item.get("pasta") or os.path.join("pdfs", nome)),
+            "aula": int(aula) if aula.isdigit() else None,
+            "modo": modo,
+        })
+    return trabalhos
+
+
+def executar_lote(trabalhos: list[dict], cursos_simultaneos: int = 1, navegadores: int = NAVEGADORES_SIMULTANEOS, max_simultaneos: int = MAX_DOWNLOADS_SIMULTANEOS, max_por_host: int = MAX_DOWNLOADS_POR_HOST, tempo_maximo_espera: float = TEMPO_MAXIMO_ESPERA, sondar: bool = True, usar_cache: bool = True, perfil: str | None = PASTA_PERFIL_NAVEGADOR, usar_fila: bool = True, **opcoes_download) -> list[dict]:
+    sessao = carregar_sessao(tamanho_pool=max_simultaneos * 2 * max(1, cursos_simultaneos))
+    resultados: list[dict] = []
+
+    with PoolNavegadores(navegadores, perfil=perfil) as pool:
+        def _executar(posicao: int, trabalho: dict) -> dict:
+            print(f"\n========== [{posicao}/{len(trabalhos)}] {trabalho['nome']} ==========")
+            inicio = time.monotonic()
+            try:
+                if trabalho["modo"] == "curso":
+                    baixados = baixar_pdfs_curso(
+                        trabalho["url"], trabalho["pasta"], apenas_aula=trabalho["aula"],
+                        max_simultaneos=max_simultaneos, max_por_host=max_por_host,
+                        tempo_maximo_espera=tempo_maximo_espera, navegadores=navegadores,
+                        sessao=sessao, pool=pool, usar_cache=usar_cache, usar_fila=usar_fila, **opcoes_download,
+                    )
+                else:
+                    baixados = baixar_pdfs_site(
+                        trabalho["url"], trabalho["pasta"], sessao, usar_selenium=trabalho["modo"] == "navegador",
+                        max_simultaneos=max_simultaneos, max_por_host=max_por_host,
+                        tempo_maximo_espera=tempo_maximo_espera, sondar=sondar, perfil=perfil, pool=pool, **opcoes_download,
+                    )
+                situacao = "ok"
+            except Exception as e:
+                print(f"  [Erro] {trabalho['nome']}: {e}")
+                baixados, situacao = 0, "erro"
+            return {**trabalho, "baixados": baixados, "segundos": time.monotonic() - inicio, "situacao": situacao}
+
+        with ThreadPoolExecutor(max_workers=max(1, cursos_simultaneos), thread_name_prefix="curso") as executor:
+            futuros = [executor.submit(_executar, n, t) for n, t in enumerate(trabalhos, start=1)]
+            resultados = [f.result() for f in futuros]
+
+    _imprimir_resumo_lote(resultados)
+    return resultados
+
+
+def _imprimir_resumo_lote(resultados: list[dict]) -> None:
+    largura = max([len(r["nome"]) for r in resultados] + [5])
+    print(f"\n  {'Curso':<{largura}}  {'Modo':<9}  {'PDFs':>5}  {'Tempo':>8}  Situacao")
+    print(f"  {'-' * (largura + 38)}")
+    for r in resultados:
+        print(f"  {r['nome']:<{largura}}  {r['modo']:<9}  {r['baixados']:>5}  {r['segundos']:>7.1f}s  {r['situacao']}")
+
+
+def _gravar_metricas(caminho: str | None) -> None:
+    if not caminho:
+        return
+    try:
+        METRICAS.gravar(caminho)
+        print(f"  [Metricas] Relatorio salvo em {caminho}")
+    except OSError as e:
+        print(f"  [Aviso] Nao foi possivel salvar as metricas: {e}")
+
+
+def _imprimir_busca(termo: str, apenas_quebrados: bool = False) -> None:
+    if not os.path.exists(VERIFICADOR.caminho_indice):
+        print("  Nenhum PDF verificado ainda.")
+        return
+    encontrados = VERIFICADOR.indice().buscar(termo, apenas_quebrados)
+    if not encontrados:
+        print("  Nada encontrado no indice.")
+    for pdf in encontrados:
+        estado = "OK" if pdf["ok"] else f"DEFEITO: {pdf['erro']}"
+        paginas = f"{pdf['paginas']} pag." if pdf["paginas"] else "? pag."
+        print(f"  [{estado}] {paginas} | {pdf['titulo'] or '(sem titulo)'} | {pdf['caminho']}")
+    print(f"\n{len(encontrados)} PDF(s) no indice {VERIFICADOR.caminho_indice}")
+
+
 def main():
     pasta_destino = "pdfs"
     if "--pasta" in sys.argv:
@@ -517,8 +3222,137 @@ def main():
             apenas_aula = int(sys.argv[idx + 1])
             excluir.add(sys.argv[idx + 1])
 
+    max_simultaneos = MAX_DOWNLOADS_SIMULTANEOS
+    for opcao in ("--simultaneos", "-j"):
+        if opcao in sys.argv:
+            idx = sys.argv.index(opcao)
+            if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+                max_simultaneos = int(sys.argv[idx + 1])
+                excluir.add(sys.argv[idx + 1])
+    max_por_host = MAX_DOWNLOADS_POR_HOST
+    if "--por-host" in sys.argv:
+        idx = sys.argv.index("--por-host")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            max_por_host = int(sys.argv[idx + 1])
+            excluir.add(sys.argv[idx + 1])
+
+    tempo_maximo_espera = TEMPO_MAXIMO_ESPERA
+    if "--espera-maxima" in sys.argv:
+        idx = sys.argv.index("--espera-maxima")
+        if idx + 1 < len(sys.argv):
+            try:
+                tempo_maximo_espera = float(sys.argv[idx + 1])
+                excluir.add(sys.argv[idx + 1])
+            except ValueError:
+                pass
+
+    navegadores = NAVEGADORES_SIMULTANEOS
+    if "--navegadores" in sys.argv:
+        idx = sys.argv.index("--navegadores")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            navegadores = max(1, int(sys.argv[idx + 1]))
+            excluir.add(sys.argv[idx + 1])
+
+    sempre_navegador = usar_selenium and modo_curso
+    sondar = "--sem-sondagem" not in sys.argv
+    usar_cache = "--sem-cache-paginas" not in sys.argv
+    usar_fila = "--sem-fila" not in sys.argv
+    perfil = None if "--sem-perfil" in sys.argv else PASTA_PERFIL_NAVEGADOR
+
+    opcoes_download = {"pular_conhecidos": "--pular-baixados" in sys.argv}
+    if "--bloco-kb" in sys.argv:
+        idx = sys.argv.index("--bloco-kb")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            opcoes_download["tamanho_bloco"] = max(1, int(sys.argv[idx + 1])) * 1024
+            excluir.add(sys.argv[idx + 1])
+    if "--fsync-mb" in sys.argv:
+        idx = sys.argv.index("--fsync-mb")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            opcoes_download["fsync_a_cada"] = int(sys.argv[idx + 1]) * 1024 * 1024
+            excluir.add(sys.argv[idx + 1])
+    if "--blobs" in sys.argv:
+        idx = sys.argv.index("--blobs")
+        if idx + 1 < len(sys.argv):
+            opcoes_download["pasta_blobs"] = sys.argv[idx + 1]
+            excluir.add(sys.argv[idx + 1])
+
+    intervalo_host = None
+    if "--intervalo-host" in sys.argv:
+        idx = sys.argv.index("--intervalo-host")
+        if idx + 1 < len(sys.argv):
+            try:
+                intervalo_host = float(sys.argv[idx + 1])
+                excluir.add(sys.argv[idx + 1])
+            except ValueError:
+                pass
+    cursos_simultaneos = 1
+    if "--cursos-simultaneos" in sys.argv:
+        idx = sys.argv.index("--cursos-simultaneos")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            cursos_simultaneos = max(1, int(sys.argv[idx + 1]))
+            excluir.add(sys.argv[idx + 1])
+    profundidade = PROFUNDIDADE_RASTREIO
+    if "--profundidade" in sys.argv:
+        idx = sys.argv.index("--profundidade")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            profundidade = int(sys.argv[idx + 1])
+            excluir.add(sys.argv[idx + 1])
+    max_paginas = MAX_PAGINAS_RASTREIO
+    if "--max-paginas" in sys.argv:
+        idx = sys.argv.index("--max-paginas")
+        if idx + 1 < len(sys.argv) and sys.argv[idx + 1].isdigit():
+            max_paginas = int(sys.argv[idx + 1])
+            excluir.add(sys.argv[idx + 1])
+    arquivo_metricas = None
+    if "--metricas" in sys.argv:
+        idx = sys.argv.index("--metricas")
+        if idx + 1 < len(sys.argv):
+            arquivo_metricas = sys.argv[idx + 1]
+            excluir.add(arquivo_metricas)
+    if "--regras" in sys.argv:
+        idx = sys.argv.index("--regras")
+        if idx + 1 < len(sys.argv):
+            configurar_regras(sys.argv[idx + 1])
+            excluir.add(sys.argv[idx + 1])
+    if "--buscar" in sys.argv or "--quebrados" in sys.argv:
+        termo = ""
+        if "--buscar" in sys.argv:
+            idx = sys.argv.index("--buscar")
+            if idx + 1 < len(sys.argv):
+                termo = sys.argv[idx + 1]
+        _imprimir_busca(termo, "--quebrados" in sys.argv)
+        VERIFICADOR.fechar()
+        return
+    VERIFICADOR.configurar(ativo="--sem-verificacao" not in sys.argv)
+    arquivo_lote = None
+    if "--lote" in sys.argv:
+        idx = sys.argv.index("--lote")
+        if idx + 1 < len(sys.argv):
+            arquivo_lote = sys.argv[idx + 1]
+            excluir.add(arquivo_lote)
+
     urls = [u for u in sys.argv[1:] if not u.startswith("-") and u not in excluir]
 
+    if arquivo_lote:
+        intervalo = INTERVALO_HOST_LOTE if intervalo_host is None else intervalo_host
+        LIMITADOR.configurar(1 / intervalo if intervalo > 0 else 0.0)
+        try:
+            trabalhos = carregar_lote(arquivo_lote)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"  [Erro] Lote {arquivo_lote}: {e}")
+            return
+        print(f"=== Bot de Download de PDFs — lote com {len(trabalhos)} item(ns) ===")
+        resultados = executar_lote(
+            trabalhos, cursos_simultaneos, navegadores, max_simultaneos, max_por_host,
+            tempo_maximo_espera, sondar=sondar, usar_cache=usar_cache, perfil=perfil, usar_fila=usar_fila, **opcoes_download,
+        )
+        print(f"\nTotal: {sum(r['baixados'] for r in resultados)} PDF(s) baixado(s)")
+        VERIFICADOR.fechar()
+        _gravar_metricas(arquivo_metricas)
+        return
+    if intervalo_host:
+        LIMITADOR.configurar(1 / intervalo_host)
+
     if not urls:
         print("  Uso: python bot_pdf.py --curso <URL> ou python bot_pdf.py <URL>")
         print("  Exemplo: python bot_pdf.py --curso https://.../cursos/123456/aulas")
@@ -526,25 +3360,33 @@ def main():
 
     print("=== Bot de Download de PDFs ===\n")
 
-    if modo_curso:
+    if "--rastrear" in sys.argv:
+        print("  [Modo rastreio] Seguindo paginação e subpáginas do mesmo site\n")
+        sessao = carregar_sessao()
+        total = 0
+        for url in urls:
+            total += rastrear_site(url, pasta_destino, sessao, profundidade, max_paginas, respeitar_robots="--ignorar-robots" not in sys.argv, max_simultaneos=max_simultaneos, max_por_host=max_por_host, sondar=sondar, **opcoes_download)
+    elif modo_curso:
         if apenas_aula:
             print("  [Modo curso] Apenas aula", apenas_aula, "\n")
         else:
             print("  [Modo curso] Baixando de todas as aulas\n")
-        total = baixar_pdfs_curso(urls[0], pasta_destino, apenas_aula=apenas_aula)
+        total = baixar_pdfs_curso(urls[0], pasta_destino, apenas_aula=apenas_aula, max_simultaneos=max_simultaneos, max_por_host=max_por_host, tempo_maximo_espera=tempo_maximo_espera, navegadores=navegadores, sempre_navegador=sempre_navegador, usar_cache=usar_cache, perfil=perfil, usar_fila=usar_fila, **opcoes_download)
     elif usar_selenium:
         print("  [Modo navegador] Usando Brave/Edge/Chrome (Selenium)\n")
         sessao = None
         total = 0
         for url in urls:
-            total += baixar_pdfs_site(url, pasta_destino, sessao, usar_selenium=True)
+            total += baixar_pdfs_site(url, pasta_destino, sessao, usar_selenium=True, max_simultaneos=max_simultaneos, max_por_host=max_por_host, tempo_maximo_espera=tempo_maximo_espera, sondar=sondar, perfil=perfil, **opcoes_download)
     else:
         sessao = carregar_sessao()
         total = 0
         for url in urls:
-            total += baixar_pdfs_site(url, pasta_destino, sessao, usar_selenium=False)
+            total += baixar_pdfs_site(url, pasta_destino, sessao, usar_selenium=False, max_simultaneos=max_simultaneos, max_por_host=max_por_host, tempo_maximo_espera=tempo_maximo_espera, incremental="--incremental" in sys.argv, sondar=sondar, **opcoes_download)
 
     print(f"\nTotal: {total} PDF(s) baixado(s) em '{pasta_destino}/'")
+    VERIFICADOR.fechar()
+    _gravar_metricas(arquivo_metricas)
 
 
 if __name__ == "__main__":